@@ -0,0 +1,251 @@
+# sys imports
+import sys, os, time, json, random, struct, tempfile, argparse, platform
+from typing import Union, Any, List, Dict, Tuple, Callable
+
+# run without a display: the Qt platform has to be chosen before PyQt5 is imported
+os.environ.setdefault( "QT_QPA_PLATFORM", "offscreen" )
+
+# pip imports
+from fbs_runtime.application_context.PyQt5 import ApplicationContext
+from PyQt5.QtCore import QSettings
+
+sys.path.append( os.path.dirname( os.path.abspath(__file__) ) )
+import main
+
+# module variables
+DEFAULT_BASELINE_PATH = os.path.join( os.path.dirname( os.path.abspath(__file__) ), "benchmark_baseline.json" )
+STAGE_NAMES = [ "traversal", "BasicFilter", "DicomFilter", "FilePrinter", "Deduplicator", "DirectoryComparer" ]
+FILE_EXTENSIONS = [ ".jpg", ".txt", ".bin", ".png" ]
+DICOM_PREAMBLE = bytes(128) + b"DICM"
+
+# functions
+def generate_tree( root:str, depth:int=3, fan_out:int=4, files_per_dir:int=20, size_distribution:str="lognormal",
+                   median_size:int=16*1024, max_size:int=4*1024*1024, duplicate_ratio:float=0.1,
+                   dicom_fraction:float=0.05, seed:int=0 ) -> Dict[str, int]:
+    """ Deterministically creates a synthetic directory tree below root. Equal parameters always produce equal trees,
+    so results of different runs (and the stored baseline) are comparable """
+    rng = random.Random( seed )
+    filler = bytes( rng.getrandbits(8) for _ in range(4096) )
+    contents:List[bytes] = []
+    stats = { "directories": 0, "files": 0, "bytes": 0, "duplicates": 0, "dicom_files": 0 }
+
+    def file_size() -> int:
+        if size_distribution == "fixed":
+            return median_size
+        elif size_distribution == "uniform":
+            return rng.randint( 0, 2 * median_size )
+        elif size_distribution == "lognormal":
+            return int( rng.lognormvariate( 0.0, 1.0 ) * median_size )
+        raise ValueError(f'Unknown size distribution "{size_distribution}"')
+
+    def fill_directory( dir_path:str, level:int ):
+        os.makedirs( dir_path, exist_ok=True )
+        stats["directories"] += 1
+        for j in range( files_per_dir ):
+            if contents and rng.random() < duplicate_ratio:
+                content = contents[ rng.randrange( len(contents) ) ]
+                stats["duplicates"] += 1
+                ext = rng.choice( FILE_EXTENSIONS )
+            else:
+                size = min( max( file_size(), 16 ), max_size )
+                # 16 unique header bytes make every generated content distinct
+                header = struct.pack( "<QQ", seed, len(contents) )
+                if rng.random() < dicom_fraction:
+                    header = DICOM_PREAMBLE + header
+                    ext = ".dcm"
+                    stats["dicom_files"] += 1
+                else:
+                    ext = rng.choice( FILE_EXTENSIONS )
+                body_size = max( size - len(header), 0 )
+                content = header + filler * ( body_size // len(filler) ) + filler[:body_size % len(filler)]
+                contents.append( content )
+            with open( os.path.join( dir_path, f"f{j}{ext}" ), "wb" ) as f:
+                f.write( content )
+            stats["files"] += 1
+            stats["bytes"] += len( content )
+        if level < depth:
+            for i in range( fan_out ):
+                fill_directory( os.path.join( dir_path, f"d{i}" ), level + 1 )
+
+    fill_directory( root, 0 )
+    return stats
+
+def io_syscalls() -> Union[int, None]:
+    """ Number of read and write syscalls of this process so far (Linux only). Other syscalls like stat and open are not counted """
+    try:
+        with open( "/proc/self/io" ) as f:
+            counters = dict( line.split(":") for line in f.read().splitlines() )
+        return int( counters["syscr"] ) + int( counters["syscw"] )
+    except ( OSError, KeyError, ValueError ):
+        return None
+
+def reset_peak_rss() -> bool:
+    """ Resets the peak resident set size of this process (Linux >= 4.0 only) """
+    try:
+        with open( "/proc/self/clear_refs", "w" ) as f:
+            f.write( "5" )
+        return True
+    except OSError:
+        return False
+
+def peak_rss() -> Union[int, None]:
+    """ Peak resident set size in bytes """
+    try:
+        with open( "/proc/self/status" ) as f:
+            for line in f:
+                if line.startswith( "VmHWM:" ):
+                    return int( line.split()[1] ) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        max_rss = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except ImportError:
+        return None
+
+def measure( stage_name:str, items:int, bytes_:int, run:Callable[[], Any] ) -> Dict[str, Any]:
+    peak_rss_resettable = reset_peak_rss()
+    syscalls_before = io_syscalls()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    syscalls_after = io_syscalls()
+    return {
+        "stage": stage_name,
+        "items": items,
+        "seconds": seconds,
+        "files_per_s": items / seconds if seconds > 0 else None,
+        "bytes_per_s": bytes_ / seconds if seconds > 0 else None,
+        "io_syscalls": syscalls_after - syscalls_before if syscalls_before is not None else None,
+        "peak_rss": peak_rss(),
+        "peak_rss_is_per_stage": peak_rss_resettable
+    }
+
+def run_benchmark( base_directory:str, target_directory:str, stage_names:List[str], repeat:int=3, num_patterns:int=0 ) -> List[Dict[str, Any]]:
+    """ Runs each stage repeat times through FesMainWindow.start_processing() on the tree in base_directory and returns the
+    best result of each stage. num_patterns synthetic exclude patterns (matching nothing) are configured for the BasicFilter """
+    # the sub windows read their settings on construction
+    main.fes_settings.setValue( "base_directories", [ base_directory ] )
+    main.fes_settings.setValue( "DirectoryComparer.target_dir_path", target_directory )
+    main.fes_settings.setValue( "BasicFilter.exclude_patterns", "; ".join( f"**/x{i}/**; IMG_{i}_*.JPG" for i in range( num_patterns // 2 ) ) )
+    main_window = main.FesMainWindow()
+
+    num_items, total_bytes = 0, 0
+    for root, dirnames, filenames in os.walk( base_directory ):
+        num_items += len( dirnames ) + len( filenames )
+        total_bytes += sum( os.path.getsize( os.path.join( root, filename ) ) for filename in filenames )
+
+    # the active filters and processor of each stage, every stage runs the complete processing loop
+    stages:Dict[str, Tuple[List[str], Union[None, str]]] = {
+        "traversal": ( [], None ),
+        "BasicFilter": ( [ "BasicFilter" ], None ),
+        "DicomFilter": ( [ "DicomFilter" ], None ),
+        "FilePrinter": ( [], "FilePrinter" ),
+        "Deduplicator": ( [], "Deduplicator" ),
+        "DirectoryComparer": ( [], "DirectoryComparer" )
+    }
+    # the traversal reads directory entries only, BasicFilter, FilePrinter and DirectoryComparer only check paths
+    stage_bytes = { "traversal": 0, "BasicFilter": 0, "FilePrinter": 0, "DirectoryComparer": 0 }
+
+    def run_stage( stage_name:str ) -> None:
+        active_filter_names, active_processor_name = stages[stage_name]
+        main.fes_settings.setValue( "active_filters", active_filter_names )
+        main.fes_settings.setValue( "active_processor", active_processor_name )
+        main_window.start_processing()
+
+    results = []
+    for stage_name in stage_names:
+        runs = [ measure( stage_name, num_items, stage_bytes.get( stage_name, total_bytes ), lambda: run_stage( stage_name ) ) for _ in range( repeat ) ]
+        results.append( min( runs, key=lambda result: result["seconds"] ) )
+    return results
+
+def compare_with_baseline( results:List[Dict[str, Any]], baseline:Dict[str, Any], tolerance:float ) -> List[str]:
+    """ Returns a message for each stage whose throughput dropped more than tolerance below the baseline """
+    baseline_results = { result["stage"]: result for result in baseline.get( "results", [] ) }
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get( result["stage"] )
+        if baseline_result is None or not baseline_result["files_per_s"] or not result["files_per_s"]:
+            continue
+        ratio = result["files_per_s"] / baseline_result["files_per_s"]
+        result["baseline_ratio"] = ratio
+        if ratio < 1.0 - tolerance:
+            regressions.append( f'{result["stage"]}: {result["files_per_s"]:.0f} files/s is {100*(1-ratio):.1f}% below the baseline ({baseline_result["files_per_s"]:.0f} files/s)' )
+    return regressions
+
+def format_results( results:List[Dict[str, Any]] ) -> str:
+    def number( value:Union[None, float], divisor:float=1.0 ) -> str:
+        return "n/a" if value is None else f"{value/divisor:.1f}"
+    lines = [ f'{"stage":<20}{"files/s":>12}{"MB/s":>10}{"read/write syscalls":>21}{"peak MB":>10}{"vs base":>10}' ]
+    for result in results:
+        ratio = result.get( "baseline_ratio" )
+        lines.append( f'{result["stage"]:<20}{number(result["files_per_s"]):>12}{number(result["bytes_per_s"], 1024*1024):>10}'
+                      f'{number(result["io_syscalls"]):>21}{number(result["peak_rss"], 1024*1024):>10}{"n/a" if ratio is None else f"{ratio:.2f}x":>10}' )
+    return "\n".join( lines )
+
+def parse_args( args:List[str] ) -> argparse.Namespace:
+    parser = argparse.ArgumentParser( description="Benchmarks the traversal, filter and processor paths of File Essentials on a synthetic tree" )
+    parser.add_argument( "--work-dir", default=None, help="Directory for the synthetic trees (default: a temporary directory)" )
+    parser.add_argument( "--depth", type=int, default=3 )
+    parser.add_argument( "--fan-out", type=int, default=4 )
+    parser.add_argument( "--files-per-dir", type=int, default=20 )
+    parser.add_argument( "--size-distribution", choices=[ "fixed", "uniform", "lognormal" ], default="lognormal" )
+    parser.add_argument( "--median-size", type=int, default=16*1024 )
+    parser.add_argument( "--max-size", type=int, default=4*1024*1024 )
+    parser.add_argument( "--duplicate-ratio", type=float, default=0.1 )
+    parser.add_argument( "--dicom-fraction", type=float, default=0.05 )
+    parser.add_argument( "--seed", type=int, default=0 )
+    parser.add_argument( "--repeat", type=int, default=3, help="Runs per stage, the fastest run is reported" )
+    parser.add_argument( "--patterns", type=int, default=0, help="Number of exclude glob patterns for the BasicFilter stage" )
+    parser.add_argument( "--stages", nargs="+", choices=STAGE_NAMES, default=STAGE_NAMES )
+    parser.add_argument( "--output", default=None, help="Write the results as JSON to this file" )
+    parser.add_argument( "--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file to compare against" )
+    parser.add_argument( "--save-baseline", action="store_true", help="Store the results as the new baseline" )
+    parser.add_argument( "--tolerance", type=float, default=0.1, help="Allowed relative throughput drop before a stage counts as regressed" )
+    return parser.parse_args( args )
+
+def run( args:argparse.Namespace ) -> int:
+    appctxt = ApplicationContext()
+    with tempfile.TemporaryDirectory( dir=args.work_dir ) as work_dir:
+        # never touch the user settings
+        main.fes_settings = main.FesSettings( QSettings( os.path.join( work_dir, "settings.ini" ), QSettings.IniFormat ) )
+
+        tree_parameters = { key: getattr( args, key ) for key in [ "depth", "fan_out", "files_per_dir", "size_distribution",
+            "median_size", "max_size", "duplicate_ratio", "dicom_fraction", "seed" ] }
+        base_directory = os.path.join( work_dir, "base" )
+        tree_stats = generate_tree( base_directory, **tree_parameters )
+        # the comparison target holds a part of the base tree
+        target_parameters = dict( tree_parameters, fan_out=max( args.fan_out // 2, 1 ), files_per_dir=max( args.files_per_dir // 2, 1 ) )
+        target_directory = os.path.join( work_dir, "target" )
+        generate_tree( target_directory, **target_parameters )
+
+        print( f'Synthetic tree: {tree_stats["directories"]} directories, {tree_stats["files"]} files, {tree_stats["bytes"]/(1024*1024):.1f} MB, '
+               f'{tree_stats["duplicates"]} duplicates, {tree_stats["dicom_files"]} DICOM files' )
+        results = run_benchmark( base_directory, target_directory, args.stages, args.repeat, args.patterns )
+
+    report = { "python": platform.python_version(), "platform": platform.platform(), "tree": tree_parameters, "patterns": args.patterns, "results": results }
+
+    regressions = []
+    if os.path.isfile( args.baseline ) and not args.save_baseline:
+        with open( args.baseline ) as f:
+            baseline = json.load( f )
+        if baseline.get( "tree" ) != tree_parameters or baseline.get( "patterns", 0 ) != args.patterns:
+            print( f'Baseline {args.baseline} was recorded with different parameters, skipping the comparison' )
+        else:
+            regressions = compare_with_baseline( results, baseline, args.tolerance )
+
+    print( format_results( results ) )
+    if args.output:
+        with open( args.output, "w" ) as f:
+            json.dump( report, f, indent=2 )
+    if args.save_baseline:
+        with open( args.baseline, "w" ) as f:
+            json.dump( report, f, indent=2 )
+        print( f'Baseline stored in {args.baseline}' )
+    for regression in regressions:
+        print( f'REGRESSION {regression}' )
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit( run( parse_args( sys.argv[1:] ) ) )
@@ -1,21 +1,114 @@
 # sys imports
-import sys, os, datetime, abc, time, shutil
-from typing import Union, Any, List, Dict
+import sys, os, datetime, abc, time, shutil, math, json, contextlib, array, threading, queue, sqlite3, re, itertools, stat, csv, errno, heapq, hashlib, struct, tempfile
+from typing import Union, Any, List, Dict, Tuple, Iterator, Iterable, NamedTuple, Callable
+try:
+    import pwd
+except ImportError: # not available on Windows
+    pwd = None
+try:
+    import fcntl
+except ImportError: # not available on Windows
+    fcntl = None
 
 # pip imports
 from fbs_runtime.application_context.PyQt5 import ApplicationContext
-from filehash import FileHash
 from PyQt5 import QtCore, QtGui
-from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtCore import Qt, QSettings, QEvent
+from PyQt5.QtGui import QIcon, QPixmap, QImage, QImageReader
+from PyQt5.QtCore import Qt, QSettings, QEvent, QTimer, QCoreApplication, QSize, QStandardPaths, QDateTime
 from PyQt5.QtWidgets import QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, \
     QListWidget, QFileDialog, QAbstractItemView, QMessageBox, QProgressDialog, QApplication, QLabel, QTextEdit, \
     QSplitter, QGroupBox, QMainWindow, QComboBox, QMdiArea, QMenu, QAction, QErrorMessage, QScrollArea, QButtonGroup, \
-    QRadioButton, QSizePolicy, QMdiSubWindow, QSpinBox, QDoubleSpinBox, QCheckBox
+    QRadioButton, QSizePolicy, QMdiSubWindow, QSpinBox, QDoubleSpinBox, QCheckBox, QDateTimeEdit
 import pydicom
+import numpy as np
+try:
+    import pyarrow, pyarrow.parquet
+except ImportError: # Parquet reports are optional
+    pyarrow = None
+
+# settings
+class FesSettings:
+    """ In-memory, typed cache over QSettings. Reads are dictionary lookups, writes are coalesced and flushed
+    to the QSettings storage on a timer and on application exit (write-behind) """
+
+    def __init__(self, settings:QSettings, flush_interval_ms:int=1000):
+        self._settings = settings
+        self._flush_interval_ms = flush_interval_ms
+        self._values:Dict[str, Any] = { key: settings.value(key) for key in settings.allKeys() }
+        self._dirty_keys:set = set()
+        self._timer:Union[None, QTimer] = None
+
+    def value( self, name:str, default_value:Any=None, type_:type=None ) -> Any:
+        """ Returns the cached value converted to type_ (or the type of default_value if type_ is None) """
+        if name not in self._values:
+            return default_value
+        value = self._values[name]
+        if value is None:
+            return default_value
+        target_type = type_ if type_ is not None else ( type(default_value) if default_value is not None else None )
+        if target_type is not None and not isinstance( value, target_type ):
+            value = FesSettings._convert( value, target_type, default_value )
+            # remember the converted value so the next read is a plain lookup
+            self._values[name] = value
+        return list( value ) if isinstance( value, list ) else value
+
+    def setValue( self, name:str, value:Any ) -> None:
+        if name in self._values and self._values[name] == value and type(self._values[name]) == type(value):
+            return
+        self._values[name] = list( value ) if isinstance( value, list ) else value
+        self._dirty_keys.add( name )
+        self._schedule_flush()
+
+    def contains( self, name:str ) -> bool:
+        return name in self._values
+
+    def clear( self ) -> None:
+        self._values.clear()
+        self._dirty_keys.clear()
+        self._settings.clear()
+
+    def flush( self ) -> None:
+        """ Writes all pending values to the QSettings storage """
+        for name in self._dirty_keys:
+            self._settings.setValue( name, self._values[name] )
+        self._dirty_keys.clear()
+
+    def sync( self ) -> None:
+        self.flush()
+        self._settings.sync()
+
+    def _schedule_flush( self ) -> None:
+        app = QCoreApplication.instance()
+        if app is None:
+            # no event loop available: write through
+            self.flush()
+            return
+        if self._timer is None:
+            self._timer = QTimer()
+            self._timer.setSingleShot( True )
+            self._timer.timeout.connect( self.flush )
+            app.aboutToQuit.connect( self.sync )
+        if not self._timer.isActive():
+            self._timer.start( self._flush_interval_ms )
+
+    @staticmethod
+    def _convert( value:Any, target_type:type, default_value:Any ) -> Any:
+        # INI and some native backends return strings (or single strings instead of one element lists)
+        try:
+            if target_type is bool:
+                return value.lower() in ( "true", "1", "yes" ) if isinstance( value, str ) else bool( value )
+            if target_type in ( list, tuple ):
+                if value is None or value == "":
+                    return target_type()
+                return target_type( value ) if isinstance( value, ( list, tuple ) ) else target_type( [ value ] )
+            if target_type is int and isinstance( value, str ):
+                return int( float( value ) )
+            return target_type( value )
+        except ( TypeError, ValueError ):
+            return default_value
 
 # module variables
-fes_settings = QSettings(QSettings.UserScope, "https://github.com/MichaelMueller", "File Essentials")
+fes_settings = FesSettings( QSettings(QSettings.UserScope, "https://github.com/MichaelMueller", "File Essentials") )
 
 # functions
 def validate_dir(dir:str, prefix:str):
@@ -23,7 +116,1067 @@ def validate_dir(dir:str, prefix:str):
         raise ValueError(f'{prefix}Please select a directory!')
     if not os.path.isdir(dir):
         raise ValueError(f'{prefix}Not a valid directory: "{dir}"!')
-  
+
+def configured_base_directories() -> List[str]:
+    """ The base directories stored in the settings (falls back to the former single base directory) """
+    legacy_base_directory = fes_settings.value("base_directory", "", str)
+    base_directories = fes_settings.value("base_directories", [ legacy_base_directory ] if legacy_base_directory else [], list)
+    return [ str(base_directory) for base_directory in base_directories if base_directory ]
+
+def is_sub_directory(directory:str, parent:str) -> bool:
+    """ True if the absolute path directory lies below the absolute path parent """
+    try:
+        return directory != parent and os.path.commonpath([directory, parent]) == parent
+    except ValueError: # different drives
+        return False
+
+def normalize_base_directories(base_directories:List[str]) -> List[str]:
+    """ Makes the directories absolute and removes duplicates and directories contained in other base directories """
+    absolute_directories = []
+    for base_directory in base_directories:
+        if base_directory and os.path.abspath(base_directory) not in absolute_directories:
+            absolute_directories.append( os.path.abspath(base_directory) )
+    return [ directory for directory in absolute_directories if not any( is_sub_directory(directory, parent) for parent in absolute_directories ) ]
+
+def walk_directory_listings(base_directory:str, with_stats:bool=False) \
+    -> Iterator[Tuple[str, int, List[str], List[str], Union[None, List[Union[None, os.stat_result]]]]]:
+    """ Walks base_directory top-down like os.walk() and yields (root, level, dirnames, filenames, stats) for each visited
+    directory. If with_stats is set, stats holds the os.stat_result (None on errors) of dirnames + filenames taken from the
+    directory scan (free on Windows, one stat per item elsewhere) """
+    stack = [ (base_directory, 0) ]
+    while stack:
+        root, level = stack.pop()
+        dirnames, filenames, dir_stats, file_stats, sub_directories = [], [], [], [], []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    entry_stat = None
+                    if with_stats:
+                        try:
+                            entry_stat = entry.stat()
+                        except OSError:
+                            pass
+                    if is_dir:
+                        dirnames.append( entry.name )
+                        dir_stats.append( entry_stat )
+                        # like os.walk: symbolic links to directories are listed but not followed
+                        if not entry.is_symlink():
+                            sub_directories.append( entry.path )
+                    else:
+                        filenames.append( entry.name )
+                        file_stats.append( entry_stat )
+        except OSError:
+            # like os.walk: unreadable directories are skipped
+            continue
+        yield root, level, dirnames, filenames, ( dir_stats + file_stats if with_stats else None )
+        for sub_directory in reversed( sub_directories ):
+            stack.append( (sub_directory, level + 1) )
+
+def walk_directories_listings(base_directories:List[str], timeout:float=0.1, with_stats:bool=False) \
+    -> Iterator[Union[None, Tuple[str, int, List[str], List[str], Union[None, List[Union[None, os.stat_result]]]]]]:
+    """ Walks all base_directories concurrently with one worker thread per device and yields the merged listings like
+    walk_directory_listings(). Listings of one base directory keep their top-down order. None is yielded if no listing
+    arrived within timeout seconds, so callers can keep the UI responsive. Closing the generator stops the workers """
+    base_directories_by_device:Dict[int, List[str]] = {}
+    for base_directory in base_directories:
+        base_directories_by_device.setdefault( os.stat(base_directory).st_dev, [] ).append( base_directory )
+
+    listings = queue.Queue( maxsize=1024 )
+    stop = threading.Event()
+    finished = object()
+
+    def walk( device_base_directories:List[str] ):
+        try:
+            for base_directory in device_base_directories:
+                for listing in walk_directory_listings(base_directory, with_stats):
+                    while not stop.is_set():
+                        try:
+                            listings.put( listing, timeout=timeout )
+                            break
+                        except queue.Full:
+                            pass
+                    if stop.is_set():
+                        return
+            listings.put( finished )
+        except Exception as e:
+            listings.put( e )
+
+    workers = [ threading.Thread( target=walk, args=(device_base_directories,), daemon=True ) for device_base_directories in base_directories_by_device.values() ]
+    for worker in workers:
+        worker.start()
+    try:
+        num_running = len( workers )
+        while num_running > 0:
+            try:
+                listing = listings.get( timeout=timeout )
+            except queue.Empty:
+                yield None
+                continue
+            if listing is finished:
+                num_running -= 1
+            elif isinstance( listing, Exception ):
+                raise listing
+            else:
+                yield listing
+    finally:
+        stop.set()
+
+# file lists
+class FileInfo(NamedTuple):
+    """ A single collected item, compatible with the former (abs_path, rel_path, level) tuples. The stat fields are
+    None if the traversal did not collect stats (or stat failed) """
+    abs_path:str
+    rel_path:str
+    level:int
+    is_dir:bool
+    size:Union[None, int] = None
+    mtime:Union[None, float] = None
+    ctime:Union[None, float] = None
+    uid:Union[None, int] = None
+
+class FileInfoStore:
+    """ Compact, columnar list of collected items of one or more base directories. Directories are interned in a parent-id
+    table, basenames are kept encoded in one buffer and levels/types in array columns. Paths are reconstructed on demand """
+
+    TYPE_FILE = 0
+    TYPE_DIRECTORY = 1
+
+    def __init__(self, base_directories:List[str], with_stats:bool=False):
+        self._base_directories = list( base_directories )
+        self._with_stats = with_stats
+        # directory table: parent directory id, the entry holding the name (-1 for base directories) and the base directory
+        self._dir_parents = array.array("l")
+        self._dir_entries = array.array("l")
+        self._dir_roots = array.array("l")
+        # entry columns
+        self._entry_dirs = array.array("l")
+        self._name_offsets = array.array("Q", [0])
+        self._names = bytearray()
+        self._levels = array.array("i")
+        self._types = array.array("b")
+        # stat columns (only filled with_stats, size -1 marks a failed stat)
+        self._sizes = array.array("q")
+        self._mtimes = array.array("d")
+        self._ctimes = array.array("d")
+        self._uids = array.array("q")
+        # directories listed but not visited yet, by absolute path
+        self._pending_dir_ids:Dict[str, int] = {}
+        self._last_dir_prefix:Tuple[int, str] = (-1, "")
+        for root_id, base_directory in enumerate( self._base_directories ):
+            self._pending_dir_ids[base_directory] = self._add_dir( -1, -1, root_id )
+
+    def __len__(self) -> int:
+        return len( self._entry_dirs )
+
+    def __getitem__(self, index:int) -> FileInfo:
+        rel_path = self.rel_path(index)
+        if self._with_stats and self._sizes[index] >= 0:
+            return FileInfo( self._join_base(index, rel_path), rel_path, self._levels[index], self._types[index] == FileInfoStore.TYPE_DIRECTORY,
+                             self._sizes[index], self._mtimes[index], self._ctimes[index], self._uids[index] )
+        return FileInfo( self._join_base(index, rel_path), rel_path, self._levels[index], self._types[index] == FileInfoStore.TYPE_DIRECTORY )
+
+    def __iter__(self) -> Iterator[FileInfo]:
+        for index in range( len(self) ):
+            yield self[index]
+
+    def base_directories(self) -> List[str]:
+        return self._base_directories
+
+    def with_stats(self) -> bool:
+        return self._with_stats
+
+    def add_listing(self, root:str, level:int, dirnames:List[str], filenames:List[str], stats:Union[None, List[Union[None, os.stat_result]]]=None) -> None:
+        """ Adds the items of one directory as yielded by walk_directory_listings(), parents have to be added first """
+        dir_id = self._pending_dir_ids.pop( root )
+        root_id = self._dir_roots[dir_id]
+        for dirname in dirnames:
+            entry = self._add_entry( dir_id, dirname, level, FileInfoStore.TYPE_DIRECTORY )
+            self._pending_dir_ids[ os.path.join(root, dirname) ] = self._add_dir( dir_id, entry, root_id )
+        for filename in filenames:
+            self._add_entry( dir_id, filename, level, FileInfoStore.TYPE_FILE )
+        if self._with_stats:
+            for entry_stat in ( stats if stats is not None else [None] * ( len(dirnames) + len(filenames) ) ):
+                if entry_stat is None:
+                    self._sizes.append( -1 )
+                    self._mtimes.append( 0.0 )
+                    self._ctimes.append( 0.0 )
+                    self._uids.append( -1 )
+                else:
+                    self._sizes.append( entry_stat.st_size )
+                    self._mtimes.append( entry_stat.st_mtime )
+                    self._ctimes.append( entry_stat.st_ctime )
+                    self._uids.append( entry_stat.st_uid )
+
+    def name(self, index:int) -> str:
+        return os.fsdecode( bytes( self._names[ self._name_offsets[index]:self._name_offsets[index+1] ] ) )
+
+    def rel_path(self, index:int) -> str:
+        return self._dir_prefix( self._entry_dirs[index] ) + self.name(index)
+
+    def abs_path(self, index:int) -> str:
+        return self._join_base( index, self.rel_path(index) )
+
+    def base_directory(self, index:int) -> str:
+        """ The base directory the item was collected in """
+        return self._base_directories[ self._dir_roots[ self._entry_dirs[index] ] ]
+
+    def level(self, index:int) -> int:
+        return self._levels[index]
+
+    def is_dir(self, index:int) -> bool:
+        return self._types[index] == FileInfoStore.TYPE_DIRECTORY
+
+    def _add_dir(self, parent_dir_id:int, entry:int, root_id:int) -> int:
+        self._dir_parents.append( parent_dir_id )
+        self._dir_entries.append( entry )
+        self._dir_roots.append( root_id )
+        return len( self._dir_parents ) - 1
+
+    def _add_entry(self, dir_id:int, name:str, level:int, type_:int) -> int:
+        self._entry_dirs.append( dir_id )
+        self._names += os.fsencode( name )
+        self._name_offsets.append( len( self._names ) )
+        self._levels.append( level )
+        self._types.append( type_ )
+        return len( self._entry_dirs ) - 1
+
+    def _join_base(self, index:int, rel_path:str) -> str:
+        return os.path.join( self.base_directory(index), rel_path if os.sep == "/" else rel_path.replace("/", os.sep) )
+
+    def _dir_prefix(self, dir_id:int) -> str:
+        """ Relative path of a directory with trailing "/", the last result is cached as items are mostly read in order """
+        if self._last_dir_prefix[0] == dir_id:
+            return self._last_dir_prefix[1]
+        names = []
+        curr_dir_id = dir_id
+        while self._dir_entries[curr_dir_id] >= 0:
+            names.append( self.name( self._dir_entries[curr_dir_id] ) )
+            curr_dir_id = self._dir_parents[curr_dir_id]
+        prefix = "".join( name + "/" for name in reversed(names) )
+        self._last_dir_prefix = (dir_id, prefix)
+        return prefix
+
+# disk i/o
+READ_CHUNK_SIZE = 1024 * 1024
+
+# struct fiemap with room for a single struct fiemap_extent, see linux/fiemap.h
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct( "=QQIIII" )
+FIEMAP_EXTENT_SIZE = 56
+
+READ_ORDERS = [ "Traversal order", "Inode order", "Disk extent order (FIEMAP)" ]
+
+def fadvise( fd:int, advice_name:str ) -> None:
+    """ posix_fadvise() on the whole file, ignored where unsupported. advice_name e.g. "POSIX_FADV_SEQUENTIAL" """
+    advice = getattr( os, advice_name, None )
+    if advice is not None:
+        try:
+            os.posix_fadvise( fd, 0, 0, advice )
+        except OSError:
+            pass
+
+@contextlib.contextmanager
+def sequential_read( file_path:str, drop_cache:bool=True ):
+    """ Opens file_path for a single sequential pass (larger readahead). drop_cache evicts its pages afterwards so that
+    reading a large tree does not push everything else out of the page cache """
+    with open( file_path, "rb", buffering=0 ) as f:
+        fadvise( f.fileno(), "POSIX_FADV_SEQUENTIAL" )
+        try:
+            yield f
+        finally:
+            if drop_cache:
+                fadvise( f.fileno(), "POSIX_FADV_DONTNEED" )
+
+def hash_file( file_path:str, hash_method:str ) -> str:
+    """ Hex digest of the file content, hash_method is a hashlib name like "md5" or "sha1" """
+    hash = hashlib.new( hash_method )
+    buffer = bytearray( READ_CHUNK_SIZE )
+    view = memoryview( buffer )
+    with sequential_read( file_path ) as f:
+        while True:
+            num_bytes = f.readinto( buffer )
+            if not num_bytes:
+                break
+            hash.update( view[:num_bytes] )
+    return hash.hexdigest()
+
+def copy_file( source_path:str, target_path:str ) -> None:
+    """ shutil.copy() which evicts the pages of the source file afterwards """
+    shutil.copy( source_path, target_path )
+    try:
+        with open( source_path, "rb", buffering=0 ) as f:
+            fadvise( f.fileno(), "POSIX_FADV_DONTNEED" )
+    except OSError:
+        pass
+
+def physical_offset( fd:int ) -> Union[None, int]:
+    """ The physical byte offset of the first extent of the file via the FIEMAP ioctl. None if the file has no extents,
+    raises OSError if the file system does not support FIEMAP """
+    if fcntl is None:
+        raise OSError( errno.EOPNOTSUPP, "FIEMAP is not available" )
+    buffer = bytearray( FIEMAP_HEADER.pack( 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0 ) + bytes( FIEMAP_EXTENT_SIZE ) )
+    fcntl.ioctl( fd, FS_IOC_FIEMAP, buffer, True )
+    _, _, _, num_mapped_extents, _, _ = FIEMAP_HEADER.unpack_from( buffer )
+    if num_mapped_extents == 0:
+        return None
+    # fe_logical, fe_physical
+    return struct.unpack_from( "=QQ", buffer, FIEMAP_HEADER.size )[1]
+
+def disk_read_order( file_infos:"FileInfoStore", read_order:str, progress:Callable[[int], bool]=None ) -> Union[None, np.ndarray]:
+    """ Returns the indices of file_infos sorted for reading the files with few seeks: grouped by device and sorted by inode
+    number or, with "Disk extent order (FIEMAP)", by the physical offset of the first extent (falls back to the inode number
+    per device without FIEMAP support). Directories keep their position in front, files that can not be stat'ed come last.
+    Returns None if progress() returns False """
+    use_extents = read_order == READ_ORDERS[2]
+    no_extents_devices = set()
+    devices = array.array( "q", bytes( 8 * len( file_infos ) ) )
+    # unsigned, inode numbers may use all 64 bits
+    inodes = array.array( "Q", bytes( 8 * len( file_infos ) ) )
+    offsets = array.array( "Q", bytes( 8 * len( file_infos ) ) ) if use_extents else None
+    for index in range( len( file_infos ) ):
+        if progress is not None and index % 1024 == 0 and progress( index ) is False:
+            return None
+        if file_infos.is_dir( index ):
+            devices[index] = -1
+            continue
+        try:
+            if use_extents:
+                fd = os.open( file_infos.abs_path( index ), os.O_RDONLY )
+                try:
+                    file_stat = os.fstat( fd )
+                    devices[index], inodes[index] = file_stat.st_dev, file_stat.st_ino
+                    if file_stat.st_dev not in no_extents_devices:
+                        try:
+                            offsets[index] = physical_offset( fd ) or 0
+                        except OSError:
+                            no_extents_devices.add( file_stat.st_dev )
+                finally:
+                    os.close( fd )
+            else:
+                file_stat = os.stat( file_infos.abs_path( index ) )
+                devices[index], inodes[index] = file_stat.st_dev, file_stat.st_ino
+        except OSError:
+            devices[index] = sys.maxsize
+
+    devices, inodes = np.frombuffer( devices, dtype=np.int64 ), np.frombuffer( inodes, dtype=np.uint64 )
+    if use_extents:
+        inodes = np.where( np.isin( devices, list( no_extents_devices ) ), inodes, np.frombuffer( offsets, dtype=np.uint64 ) )
+    # lexsort is stable, ties (and the directories) keep the traversal order
+    return np.lexsort( (inodes, devices) )
+
+# path patterns
+def glob_to_regex_tokens(pattern:str) -> List[str]:
+    """ Translates a glob pattern on "/" separated relative paths into regex fragments. "*" and "?" stay within one path
+    component, "**" spans components, "**/" matches zero or more directories and a trailing "/**" also matches the
+    directory itself. Patterns without "/" match the basename in any directory """
+    pattern = pattern.strip().replace("\\", "/")
+    tokens = [] if "/" in pattern.rstrip("/") else [ "(?:.*/)?" ]
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            tokens.append( "(?:.*/)?" )
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            tokens.append( "(?:/.*)?" )
+            i += 3
+        elif pattern.startswith("**", i):
+            tokens.append( ".*" )
+            i += 2
+        elif pattern[i] == "*":
+            tokens.append( "[^/\n]*" )
+            i += 1
+        elif pattern[i] == "?":
+            tokens.append( "[^/\n]" )
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i+2:]:
+            end = pattern.index( "]", i + 2 )
+            content = pattern[i+1:end].replace("\\", "\\\\")
+            # a negated class stays within one path component and must not match the newline between two paths of a batch
+            content = "^" + content[1:] + "/\n" if content.startswith(("!", "^")) else content
+            tokens.append( "[" + content + "]" )
+            i = end + 1
+        else:
+            tokens.append( re.escape( pattern[i] ) )
+            i += 1
+    return tokens
+
+class PathMatcher:
+    """ Compiles any number of glob patterns into one regex whose alternatives are factored by a prefix trie.
+    match_batch() matches a whole batch of relative paths with a single regex scan """
+
+    def __init__(self, patterns:List[str], case_sensitive:bool=False):
+        self._patterns = [ pattern.strip() for pattern in patterns if pattern.strip() ]
+        trie:dict = {}
+        for pattern in self._patterns:
+            node = trie
+            for token in glob_to_regex_tokens( pattern ):
+                node = node.setdefault( token, {} )
+            node[None] = {}
+        flags = re.MULTILINE | ( 0 if case_sensitive else re.IGNORECASE )
+        self._regex = re.compile( "^" + PathMatcher._trie_to_regex(trie) + "$", flags ) if self._patterns else None
+
+    def __bool__(self) -> bool:
+        return self._regex is not None
+
+    def match(self, rel_path:str) -> bool:
+        return self._regex is not None and self._regex.fullmatch( rel_path ) is not None
+
+    def match_batch(self, rel_paths:List[str]) -> List[bool]:
+        if not rel_paths:
+            # an empty batch would be scanned as one empty line
+            return []
+        if self._regex is None:
+            return [False] * len(rel_paths)
+        if any( "\n" in rel_path for rel_path in rel_paths ):
+            return [ self.match(rel_path) for rel_path in rel_paths ]
+        # one line per path, each match of the anchored regex is exactly one line
+        line_starts = { start: index for index, start in enumerate( itertools.accumulate( [0] + [ len(rel_path) + 1 for rel_path in rel_paths[:-1] ] ) ) }
+        matches = [False] * len(rel_paths)
+        for match in self._regex.finditer( "\n".join(rel_paths) ):
+            matches[ line_starts[ match.start() ] ] = True
+        return matches
+
+    @staticmethod
+    def _trie_to_regex(node:dict) -> str:
+        alternatives = [ token + PathMatcher._trie_to_regex(child) for token, child in node.items() if token is not None ]
+        if not alternatives:
+            return ""
+        optional = None in node
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")" + ( "?" if optional else "" )
+
+# profiling
+class TimingStats:
+    """ Call count, cumulative time, bytes read and a log-bucketed latency histogram (constant memory) of one stage """
+    __slots__ = ( "calls", "total_ns", "bytes_read", "histogram" )
+    
+    BUCKETS_PER_DECADE = 10
+    NUM_BUCKETS = 12 * BUCKETS_PER_DECADE # 1ns up to 1000s
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.bytes_read = 0
+        self.histogram = [0] * TimingStats.NUM_BUCKETS
+
+    def add( self, duration_ns:int ) -> None:
+        self.calls += 1
+        self.total_ns += duration_ns
+        bucket = int( math.log10( duration_ns ) * TimingStats.BUCKETS_PER_DECADE ) if duration_ns > 1 else 0
+        self.histogram[ min( bucket, TimingStats.NUM_BUCKETS - 1 ) ] += 1
+
+    def percentile_ns( self, percentile:float ) -> float:
+        """ Approximate latency percentile (upper bound of the histogram bucket, ~26% resolution) """
+        rank = math.ceil( self.calls * percentile / 100.0 )
+        count = 0
+        for bucket, bucket_count in enumerate( self.histogram ):
+            count += bucket_count
+            if count >= rank and count > 0:
+                return 10 ** ( ( bucket + 1 ) / TimingStats.BUCKETS_PER_DECADE )
+        return 0.0
+
+    def to_dict( self ) -> Dict[str, Any]:
+        return { "calls": self.calls, "total_s": self.total_ns / 1e9, "p50_s": self.percentile_ns(50) / 1e9,
+                 "p99_s": self.percentile_ns(99) / 1e9, "bytes_read": self.bytes_read }
+
+class ProcessingProfiler:
+    """ Collects per stage timings of a processing run (traversal, each filter, the processor, console and progress updates).
+    Plugins can use section() for own stages and add_bytes_read() to account the bytes read by the currently running stage """
+
+    MAX_TRACE_EVENTS = 1000000
+
+    def __init__(self):
+        self._stats:Dict[str, TimingStats] = {}
+        self._current:Union[None, str] = None
+        self._record_trace = False
+        self._trace_events:List[Tuple[str, int, int]] = []
+        self._start_ns = time.perf_counter_ns()
+
+    def reset( self, record_trace:bool=False ) -> None:
+        """ Clears all stats, record_trace additionally keeps single events for the Chrome trace export """
+        self._stats = {}
+        self._current = None
+        self._record_trace = record_trace
+        self._trace_events = []
+        self._start_ns = time.perf_counter_ns()
+
+    def start( self, name:str ) -> int:
+        self._current = name
+        return time.perf_counter_ns()
+
+    def stop( self, name:str, start_ns:int ) -> None:
+        duration_ns = time.perf_counter_ns() - start_ns
+        stats = self._stats.get( name )
+        if stats is None:
+            stats = self._stats[name] = TimingStats()
+        stats.add( duration_ns )
+        if self._record_trace and len( self._trace_events ) < ProcessingProfiler.MAX_TRACE_EVENTS:
+            self._trace_events.append( (name, start_ns, duration_ns) )
+        self._current = None
+
+    @contextlib.contextmanager
+    def section( self, name:str ):
+        """ Times the enclosed block as stage name, e.g. "with profiler.section('MyPlugin.parse'):" """
+        outer = self._current
+        start_ns = self.start( name )
+        try:
+            yield
+        finally:
+            self.stop( name, start_ns )
+            self._current = outer
+
+    def timed_iter( self, name:str, iterable:Iterable ) -> Iterator:
+        """ Yields the items of iterable and times each step as stage name """
+        iterator = iter( iterable )
+        while True:
+            start_ns = self.start( name )
+            try:
+                item = next( iterator )
+            except StopIteration:
+                self._current = None
+                return
+            self.stop( name, start_ns )
+            yield item
+
+    def add_bytes_read( self, num_bytes:int, name:Union[None, str]=None ) -> None:
+        name = name if name is not None else self._current
+        if name is None:
+            return
+        stats = self._stats.get( name )
+        if stats is None:
+            stats = self._stats[name] = TimingStats()
+        stats.bytes_read += num_bytes
+
+    def stats( self ) -> Dict[str, TimingStats]:
+        return self._stats
+
+    def summary_lines( self ) -> List[str]:
+        lines = [ "<b>Processing profile</b> (stage: calls, total, p50, p99, read):",
+                  "(the time of nested stages, e.g. console output of a processor, is also included in the enclosing stage)" ]
+        for name, stats in sorted( self._stats.items(), key=lambda item: item[1].total_ns, reverse=True ):
+            lines.append( f'{name}: {stats.calls} calls, {stats.total_ns/1e9:.3f} s, p50 {stats.percentile_ns(50)/1e3:.1f} µs, '
+                          f'p99 {stats.percentile_ns(99)/1e3:.1f} µs, {stats.bytes_read/(1024*1024):.1f} MB' )
+        return lines
+
+    def export_json( self, file_path:str ) -> None:
+        with open( file_path, "w" ) as f:
+            json.dump( { name: stats.to_dict() for name, stats in self._stats.items() }, f, indent=2 )
+
+    def export_chrome_trace( self, file_path:str ) -> None:
+        """ Writes the recorded events in the Chrome trace event format (chrome://tracing, Perfetto) """
+        with open( file_path, "w" ) as f:
+            f.write( '{"traceEvents":[' )
+            for i, ( name, start_ns, duration_ns ) in enumerate( self._trace_events ):
+                event = { "name": name, "cat": name.split(":")[0], "ph": "X", "pid": os.getpid(), "tid": 0,
+                          "ts": ( start_ns - self._start_ns ) / 1e3, "dur": duration_ns / 1e3 }
+                f.write( ( "," if i > 0 else "" ) + json.dumps( event ) )
+            f.write( '],"displayTimeUnit":"ms"}' )
+
+# error handling
+class ProcessingError(NamedTuple):
+    """ A failure of a processing run. path is empty for failures not related to a single item (e.g. before_processing) """
+    path: str
+    stage: str
+    error: str
+    message: str
+    attempts: int
+
+# errno values that may go away on a retry (busy or slow network and removable drives)
+TRANSIENT_ERRNOS = { errno.EAGAIN, errno.EBUSY, errno.EINTR, errno.EIO, errno.ETIMEDOUT, getattr( errno, "ESTALE", errno.EIO ) }
+
+def is_transient_error( exception:BaseException ) -> bool:
+    return isinstance( exception, (TimeoutError, InterruptedError, BlockingIOError) ) or \
+        ( isinstance( exception, OSError ) and exception.errno in TRANSIENT_ERRNOS )
+
+class ErrorCollector:
+    """ Records the failures of a processing run without blocking it. Items failing with a transient I/O error are
+    scheduled for a retry with exponential backoff instead, the processing loop picks them up with due_retries() """
+
+    MAX_REPORTED_ERRORS = 20
+
+    def __init__(self):
+        self.reset()
+
+    def reset( self, max_retries:int=0, retry_backoff:float=0.5, abort_threshold:int=0 ) -> None:
+        """ abort_threshold=0 never aborts """
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._abort_threshold = abort_threshold
+        self._errors:List[ProcessingError] = []
+        self._num_retries = 0
+        self._retries:List[Tuple[float, int, Any, str, BaseException, int]] = []
+        self._retry_counter = itertools.count()
+
+    def handle( self, item:Any, path:str, stage:str, exception:BaseException, attempts:int=1, retry:bool=True ) -> bool:
+        """ Schedules a retry of item if retry is set, the error is transient and retries are left, otherwise records the
+        error. Returns True if a retry was scheduled """
+        if retry and attempts <= self._max_retries and is_transient_error( exception ):
+            due_time = time.monotonic() + self._retry_backoff * 2 ** ( attempts - 1 )
+            heapq.heappush( self._retries, (due_time, next( self._retry_counter ), item, stage, exception, attempts) )
+            self._num_retries += 1
+            return True
+        self.record( path, stage, exception, attempts )
+        return False
+
+    def record( self, path:str, stage:str, exception:BaseException, attempts:int=1 ) -> ProcessingError:
+        error = ProcessingError( path, stage, type( exception ).__name__, str( exception ), attempts )
+        self._errors.append( error )
+        return error
+
+    def due_retries( self ) -> List[Tuple[Any, int]]:
+        """ Removes and returns the items (with their next attempt number) whose backoff has elapsed """
+        now = time.monotonic()
+        due = []
+        while self._retries and self._retries[0][0] <= now:
+            _, _, item, _, _, attempts = heapq.heappop( self._retries )
+            due.append( (item, attempts + 1) )
+        return due
+
+    def pending_retries( self ) -> int:
+        return len( self._retries )
+
+    def seconds_to_next_retry( self ) -> Union[None, float]:
+        return max( 0.0, self._retries[0][0] - time.monotonic() ) if self._retries else None
+
+    def drop_retries( self, path_of:Callable[[Any], str] ) -> None:
+        """ Records the last error of all pending retries, e.g. if the run was canceled """
+        for _, _, item, stage, exception, attempts in self._retries:
+            self.record( path_of( item ), stage, exception, attempts )
+        self._retries = []
+
+    def abort_requested( self ) -> bool:
+        return self._abort_threshold > 0 and len( self._errors ) >= self._abort_threshold
+
+    def errors( self ) -> List[ProcessingError]:
+        return self._errors
+
+    def summary_lines( self ) -> List[str]:
+        if not self._errors and not self._num_retries:
+            return []
+        stage_counts:Dict[str, int] = {}
+        for error in self._errors:
+            stage_counts[error.stage] = stage_counts.get( error.stage, 0 ) + 1
+        lines = [ f'<b>{len( self._errors )} errors</b> ({self._num_retries} retries): ' + ", ".join( f'{stage}: {count}' for stage, count in stage_counts.items() ) ]
+        for error in self._errors[:ErrorCollector.MAX_REPORTED_ERRORS]:
+            lines.append( f'Error in {error.stage} for "{error.path}": {error.error}: {error.message} ({error.attempts} attempts)' )
+        if len( self._errors ) > ErrorCollector.MAX_REPORTED_ERRORS:
+            lines.append( f'... {len( self._errors ) - ErrorCollector.MAX_REPORTED_ERRORS} more errors, see the error report' )
+        return lines
+
+    def export_csv( self, file_path:str ) -> None:
+        with open( file_path, "w", newline="", encoding="utf-8" ) as f:
+            writer = csv.writer( f )
+            writer.writerow( ProcessingError._fields )
+            writer.writerows( self._errors )
+
+# duplicate indices
+class ReferenceIndex:
+    """ Persistent SQLite index of the files of a reference tree. Only paths, sizes and mtimes are collected when the
+    index is built, hashes are computed on the first size match and stored for later runs """
+
+    BATCH_SIZE = 10000
+
+    def __init__(self, index_file_path:str):
+        self._connection = sqlite3.connect( index_file_path )
+        self._connection.execute( "PRAGMA journal_mode=WAL" )
+        self._connection.execute( "PRAGMA synchronous=NORMAL" )
+        self._connection.execute( "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, "
+                                  "hash TEXT, hash_method TEXT, generation INTEGER NOT NULL)" )
+        self._connection.execute( "CREATE INDEX IF NOT EXISTS files_size ON files (size)" )
+        self._connection.execute( "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)" )
+        self._connection.commit()
+        self._sizes:Union[None, set] = None
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def reference_directory(self) -> Union[None, str]:
+        row = self._connection.execute( "SELECT value FROM meta WHERE key = 'reference_directory'" ).fetchone()
+        return row[0] if row else None
+
+    def build(self, reference_directory:str, progress:Callable[[int], bool]=None) -> int:
+        """ Adds new and changed files of reference_directory and drops vanished ones. Hashes of unchanged files are kept.
+        progress is called with the number of files indexed so far and may return False to cancel. Returns the number of files """
+        reference_directory = os.path.abspath( reference_directory )
+        generation = self._connection.execute( "SELECT COALESCE(MAX(generation), 0) + 1 FROM files" ).fetchone()[0]
+        rows = []
+        num_files = 0
+        for listing in walk_directories_listings( [ reference_directory ], with_stats=True ):
+            if listing is not None:
+                root, _, dirnames, filenames, stats = listing
+                for filename, file_stat in zip( filenames, stats[len(dirnames):] ):
+                    if file_stat is not None:
+                        rows.append( (file_stat.st_size, file_stat.st_mtime, os.path.join( root, filename ), generation) )
+                num_files += len( filenames )
+                if len( rows ) >= ReferenceIndex.BATCH_SIZE:
+                    self._write_rows( rows )
+                    rows = []
+            if progress is not None and progress( num_files ) is False:
+                self._connection.commit()
+                return num_files
+        self._write_rows( rows )
+        self._connection.execute( "DELETE FROM files WHERE generation < ?", (generation,) )
+        self._connection.execute( "INSERT OR REPLACE INTO meta (key, value) VALUES ('reference_directory', ?)", (reference_directory,) )
+        self._connection.commit()
+        self._sizes = None
+        return num_files
+
+    def load(self) -> None:
+        """ Loads the file sizes into memory for the O(1) pre-check """
+        self._sizes = set( row[0] for row in self._connection.execute( "SELECT DISTINCT size FROM files" ) )
+
+    def contains_size(self, size:int) -> bool:
+        if self._sizes is None:
+            self.load()
+        return size in self._sizes
+
+    def find_duplicate(self, file_path:str, size:int, file_hash:str, hash_method:str, hash_file:Callable[[str], str]) -> Union[None, str]:
+        """ Returns the path of a reference file with equal size and hash, file_path itself is never returned. Candidates
+        without a stored hash for hash_method are hashed with hash_file and the result is stored """
+        if not self.contains_size( size ):
+            return None
+        duplicate_path = None
+        for path, mtime, hash, stored_hash_method in self._connection.execute( "SELECT path, mtime, hash, hash_method FROM files WHERE size = ?", (size,) ).fetchall():
+            if hash is None or stored_hash_method != hash_method:
+                try:
+                    file_stat = os.stat( path )
+                    if file_stat.st_size != size or file_stat.st_mtime != mtime:
+                        # changed since the index was built
+                        continue
+                    hash = hash_file( path )
+                except OSError:
+                    continue
+                self._connection.execute( "UPDATE files SET hash = ?, hash_method = ? WHERE path = ?", (hash, hash_method, path) )
+            if hash == file_hash:
+                try:
+                    if os.path.samefile( path, file_path ):
+                        continue
+                except OSError:
+                    continue
+                duplicate_path = path
+                break
+        self._connection.commit()
+        return duplicate_path
+
+    def _write_rows(self, rows:List[Tuple[int, float, str, int]]) -> None:
+        # keep the hash of unchanged files (the SET expressions see the old values)
+        self._connection.executemany( "UPDATE files SET hash = CASE WHEN size = ?1 AND mtime = ?2 THEN hash ELSE NULL END, "
+                                      "size = ?1, mtime = ?2, generation = ?4 WHERE path = ?3", rows )
+        self._connection.executemany( "INSERT OR IGNORE INTO files (size, mtime, path, generation) VALUES (?, ?, ?, ?)", rows )
+
+class DigestIndex:
+    """ Maps file digests to the first path seen with that digest within a memory budget. The raw digests and path ids are
+    kept in an open addressing table (about digest_size + 8 bytes per entry instead of two strings in a dict), the paths
+    are appended to a temporary file and a path id is the offset into this file. If the table would outgrow the
+    memory budget, its entries are written to a temporary SQLite store and the table starts over. The slot of a digest
+    is given by its leading bits, so the table is (nearly) sorted and is streamed to the store as a sorted run """
+
+    INITIAL_CAPACITY = 1 << 16
+    MIN_CAPACITY = 1 << 10
+    PATH_ID_SIZE = 8
+    MAX_LOAD_FACTOR = 0.7
+    PATH_LENGTH = struct.Struct( "<I" )
+
+    def __init__(self, digest_size:int, memory_budget:int):
+        self._digest_size = digest_size
+        self._memory_budget = memory_budget
+        self._directory = tempfile.TemporaryDirectory( prefix="fes_digests_" )
+        self._paths = open( os.path.join( self._directory.name, "paths" ), "w+b" )
+        self._paths_size = 0
+        self._connection:Union[None, sqlite3.Connection] = None
+        self._num_spilled = 0
+        self._initial_capacity = DigestIndex.INITIAL_CAPACITY
+        while self._initial_capacity > DigestIndex.MIN_CAPACITY and self._memory_size( self._initial_capacity ) > memory_budget:
+            self._initial_capacity //= 2
+        self._allocate( self._initial_capacity )
+
+    def __len__(self) -> int:
+        return self._size + self._num_spilled
+
+    def num_spilled(self) -> int:
+        """ Number of entries moved to the on-disk store """
+        return self._num_spilled
+
+    def get_or_add(self, digest:bytes, path:str) -> Union[None, str]:
+        """ Returns the path stored for digest or stores path and returns None if digest is new """
+        if len( digest ) != self._digest_size:
+            raise ValueError(f'Expected a digest of {self._digest_size} bytes, got {len( digest )}')
+        slot, path_id = self._find( digest )
+        if path_id < 0 and self._connection is not None:
+            row = self._connection.execute( "SELECT path_id FROM digests WHERE digest = ?", (digest,) ).fetchone()
+            path_id = row[0] if row is not None else -1
+        if path_id >= 0:
+            return self._path( path_id )
+
+        if self._size + 1 > self._capacity * DigestIndex.MAX_LOAD_FACTOR:
+            # the old table is kept while rehashing into the new one
+            if self._memory_size( self._capacity ) + self._memory_size( 2 * self._capacity ) > self._memory_budget:
+                self._spill()
+            else:
+                self._resize( 2 * self._capacity )
+            slot, _ = self._find( digest )
+        self._keys[slot * self._digest_size:(slot + 1) * self._digest_size] = digest
+        self._path_ids[slot] = self._add_path( path )
+        self._size += 1
+        return None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if not self._paths.closed:
+            self._paths.close()
+        self._directory.cleanup()
+
+    def _allocate(self, capacity:int) -> None:
+        self._capacity = capacity
+        self._slot_shift = 64 - ( capacity.bit_length() - 1 )
+        self._keys = bytearray( capacity * self._digest_size )
+        self._path_ids = array.array( "q", [ -1 ] ) * capacity
+        self._size = 0
+
+    def _memory_size(self, capacity:int) -> int:
+        return capacity * ( self._digest_size + DigestIndex.PATH_ID_SIZE )
+
+    def _find(self, digest:bytes) -> Tuple[int, int]:
+        """ Returns the slot of digest (or the free slot for it) and its path id (-1 if not found) """
+        mask = self._capacity - 1
+        # digests are uniformly distributed, their leading bits are a good and order preserving slot hash
+        slot = int.from_bytes( digest[:8], "big" ) >> self._slot_shift
+        while True:
+            path_id = self._path_ids[slot]
+            if path_id < 0:
+                return slot, -1
+            if self._keys[slot * self._digest_size:(slot + 1) * self._digest_size] == digest:
+                return slot, path_id
+            slot = ( slot + 1 ) & mask
+
+    def _entries(self, keys:bytearray, path_ids:array.array) -> Iterator[Tuple[bytes, int]]:
+        """ Yields the entries of a table in slot order """
+        for slot, path_id in enumerate( path_ids ):
+            if path_id >= 0:
+                yield bytes( keys[slot * self._digest_size:(slot + 1) * self._digest_size] ), path_id
+
+    def _resize(self, capacity:int) -> None:
+        keys, path_ids, size = self._keys, self._path_ids, self._size
+        self._allocate( capacity )
+        for digest, path_id in self._entries( keys, path_ids ):
+            slot, _ = self._find( digest )
+            self._keys[slot * self._digest_size:(slot + 1) * self._digest_size] = digest
+            self._path_ids[slot] = path_id
+        self._size = size
+
+    def _spill(self) -> None:
+        if self._connection is None:
+            self._connection = sqlite3.connect( os.path.join( self._directory.name, "digests.sqlite" ) )
+            self._connection.execute( "PRAGMA journal_mode = OFF" )
+            self._connection.execute( "PRAGMA synchronous = OFF" )
+            self._connection.execute( "CREATE TABLE digests (digest BLOB PRIMARY KEY, path_id INTEGER NOT NULL) WITHOUT ROWID" )
+        # the slot order is nearly sorted, so the B-tree is mostly appended to instead of updated at random pages
+        with self._connection:
+            self._connection.executemany( "INSERT INTO digests (digest, path_id) VALUES (?, ?)", self._entries( self._keys, self._path_ids ) )
+        self._num_spilled += self._size
+        self._allocate( self._initial_capacity )
+
+    def _add_path(self, path:str) -> int:
+        encoded_path = path.encode( "utf-8", "surrogateescape" )
+        path_id = self._paths_size
+        self._paths.seek( path_id )
+        self._paths.write( DigestIndex.PATH_LENGTH.pack( len( encoded_path ) ) + encoded_path )
+        self._paths_size += DigestIndex.PATH_LENGTH.size + len( encoded_path )
+        return path_id
+
+    def _path(self, path_id:int) -> str:
+        self._paths.seek( path_id )
+        length, = DigestIndex.PATH_LENGTH.unpack( self._paths.read( DigestIndex.PATH_LENGTH.size ) )
+        return self._paths.read( length ).decode( "utf-8", "surrogateescape" )
+
+# reports
+class ReportWriter:
+    """ Streams report rows to a CSV, JSONL or Parquet (requires pyarrow) file. Rows are written through a large
+    buffer (Parquet: in row groups), so the memory use does not depend on the number of rows """
+
+    FORMATS = [ "CSV", "JSONL", "Parquet" ]
+    COLUMNS = [ "path", "level", "type", "size", "mtime", "hash" ]
+    BUFFER_SIZE = 1024 * 1024
+    PARQUET_ROW_GROUP_SIZE = 65536
+
+    def __init__(self, file_path:str, format_:str):
+        if format_ not in ReportWriter.FORMATS:
+            raise ValueError(f'Unknown report format "{format_}"')
+        if format_ == "Parquet" and pyarrow is None:
+            raise ValueError('Parquet reports require the "pyarrow" package')
+        self._file_path = file_path
+        self._format = format_
+        self._num_rows = 0
+        if format_ == "Parquet":
+            self._schema = pyarrow.schema( [ ("path", pyarrow.string()), ("level", pyarrow.int32()), ("type", pyarrow.string()),
+                                             ("size", pyarrow.int64()), ("mtime", pyarrow.float64()), ("hash", pyarrow.string()) ] )
+            self._parquet_writer = pyarrow.parquet.ParquetWriter( file_path, self._schema )
+            self._row_group:List[tuple] = []
+        else:
+            self._file = open( file_path, "w", newline="", encoding="utf-8", buffering=ReportWriter.BUFFER_SIZE )
+            if format_ == "CSV":
+                self._csv_writer = csv.writer( self._file )
+                self._csv_writer.writerow( ReportWriter.COLUMNS )
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def file_path(self) -> str:
+        return self._file_path
+
+    def num_rows(self) -> int:
+        return self._num_rows
+
+    def write(self, path:str, level:int, type_:str, size:Union[None, int]=None, mtime:Union[None, float]=None, hash:Union[None, str]=None) -> None:
+        row = (path, level, type_, size, mtime, hash)
+        self._num_rows += 1
+        if self._format == "CSV":
+            self._csv_writer.writerow( [ "" if value is None else value for value in row ] )
+        elif self._format == "JSONL":
+            self._file.write( json.dumps( dict( zip( ReportWriter.COLUMNS, row ) ) ) + "\n" )
+        else:
+            self._row_group.append( row )
+            if len( self._row_group ) >= ReportWriter.PARQUET_ROW_GROUP_SIZE:
+                self._write_row_group()
+
+    def close(self) -> None:
+        if self._format == "Parquet":
+            if self._parquet_writer is not None:
+                self._write_row_group()
+                self._parquet_writer.close()
+                self._parquet_writer = None
+        elif not self._file.closed:
+            self._file.close()
+
+    def _write_row_group(self) -> None:
+        if self._row_group:
+            columns = list( zip( *self._row_group ) )
+            self._parquet_writer.write_table( pyarrow.Table.from_arrays( [ pyarrow.array( column, type=field.type ) for column, field in zip( columns, self._schema ) ], schema=self._schema ) )
+            self._row_group = []
+
+# perceptual hashes
+class PerceptualHasher:
+    """ Computes 64 bit aHash, dHash or pHash values of images on downscaled grayscale thumbnails """
+
+    METHODS = [ "aHash", "dHash", "pHash" ]
+    THUMBNAIL_SIZES = { "aHash": (8, 8), "dHash": (9, 8), "pHash": (32, 32) }
+
+    def __init__(self, method:str):
+        if method not in PerceptualHasher.METHODS:
+            raise ValueError(f'Unknown perceptual hash method "{method}"')
+        self._method = method
+        # orthonormal DCT-II matrix for the pHash
+        n = 32
+        k = np.arange(n).reshape(-1, 1)
+        self._dct = np.sqrt(2.0 / n) * np.cos( np.pi * (2 * np.arange(n) + 1) * k / (2 * n) )
+        self._dct[0, :] /= np.sqrt(2.0)
+
+    def method(self) -> str:
+        return self._method
+
+    def hash_file(self, abs_file_path:str) -> Union[None, int]:
+        """ Returns the hash or None if the file could not be read as image """
+        pixels = self._thumbnail( abs_file_path )
+        if pixels is None:
+            return None
+        if self._method == "aHash":
+            bits = pixels > pixels.mean()
+        elif self._method == "dHash":
+            bits = pixels[:, 1:] > pixels[:, :-1]
+        else:
+            low_frequencies = ( self._dct @ pixels @ self._dct.T )[:8, :8]
+            bits = low_frequencies > np.median( low_frequencies.flatten()[1:] )
+        return int.from_bytes( np.packbits( bits.flatten() ).tobytes(), "big" )
+
+    def _thumbnail(self, abs_file_path:str) -> Union[None, np.ndarray]:
+        width, height = PerceptualHasher.THUMBNAIL_SIZES[self._method]
+        reader = QImageReader( abs_file_path )
+        # let the decoder downscale (e.g. JPEG DCT scaling) instead of decoding the full image
+        reader.setScaledSize( QSize( 64, 64 ) )
+        image = reader.read()
+        if image.isNull():
+            return None
+        image = image.scaled( width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation ).convertToFormat( QImage.Format_Grayscale8 )
+        bits = image.constBits()
+        bits.setsize( image.bytesPerLine() * height )
+        return np.frombuffer( bits, dtype=np.uint8 ).reshape( height, image.bytesPerLine() )[:, :width].astype( np.float64 )
+
+def hamming_distance(a:int, b:int) -> int:
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """ Burkhard-Keller tree for sub-quadratic Hamming distance searches """
+
+    def __init__(self):
+        # node: [hash, item, {distance: child node}]
+        self._root:Union[None, list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, hash:int, item:Any) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [hash, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance( hash, node[0] )
+            child = node[2].get( distance )
+            if child is None:
+                node[2][distance] = [hash, item, {}]
+                return
+            node = child
+
+    def search(self, hash:int, max_distance:int) -> List[Tuple[int, Any]]:
+        """ Returns (distance, item) of all entries within max_distance, closest first """
+        results = []
+        nodes = [ self._root ] if self._root is not None else []
+        while nodes:
+            node = nodes.pop()
+            distance = hamming_distance( hash, node[0] )
+            if distance <= max_distance:
+                results.append( (distance, node[1]) )
+            # triangle inequality: only children within [distance - max_distance, distance + max_distance] can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    nodes.append( child )
+        return sorted( results, key=lambda result: result[0] )
+
+class PerceptualHashCache:
+    """ Persistent SQLite cache of perceptual hashes keyed by (device, inode, size, mtime, method) """
+
+    def __init__(self, cache_file_path:str):
+        self._connection = sqlite3.connect( cache_file_path )
+        self._connection.execute( "PRAGMA journal_mode=WAL" )
+        self._connection.execute( "CREATE TABLE IF NOT EXISTS hashes (device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, method TEXT, "
+                                  "hash BLOB, PRIMARY KEY (device, inode, size, mtime_ns, method))" )
+        self._connection.commit()
+
+    def get(self, file_stat:os.stat_result, method:str) -> Union[None, int]:
+        row = self._connection.execute( "SELECT hash FROM hashes WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ? AND method = ?",
+                                        (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns, method) ).fetchone()
+        return int.from_bytes( row[0], "big" ) if row else None
+
+    def put(self, file_stat:os.stat_result, method:str, hash:int) -> None:
+        self._connection.execute( "INSERT OR REPLACE INTO hashes (device, inode, size, mtime_ns, method, hash) VALUES (?, ?, ?, ?, ?, ?)",
+                                  (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns, method, hash.to_bytes(8, "big")) )
+
+    def close(self) -> None:
+        self._connection.commit()
+        self._connection.close()
+
 # base classes            
 class FesSubWindow(QMdiSubWindow):
     """ Each module is a subwindow """
@@ -34,11 +1187,11 @@ class FesSubWindow(QMdiSubWindow):
     def try_restore_geometry(self):
                
         # restore state
-        geometry:tuple = self.settings_value("geometry")
+        geometry:tuple = self.settings_value("geometry", ())
         #print(f'geometry in try_restore_geometry: {geometry}')
-        if isinstance( geometry, tuple ):
+        if len( geometry ) == 4:
             #pass
-            self.setGeometry( *geometry )
+            self.setGeometry( *[ int( coordinate ) for coordinate in geometry ] )
 
     def main_window( self ) -> Union[None, "FesMainWindow"]:
         curr_object = self
@@ -46,9 +1199,9 @@ class FesSubWindow(QMdiSubWindow):
             curr_object = curr_object.parent()
         return curr_object
 
-    def settings_value( self, name:str, default_value:Any=None ) -> Any:
+    def settings_value( self, name:str, default_value:Any=None, type_:type=None ) -> Any:
         settings = fes_settings
-        return settings.value( self.__class__.__name__+"."+str(name), default_value )
+        return settings.value( self.__class__.__name__+"."+str(name), default_value, type_ )
 
     def set_settings_value( self, name:str, value:Any ) -> None:
         settings = fes_settings
@@ -102,6 +1255,18 @@ class FilterSubWindow(FesSubWindow):
     @abc.abstractclassmethod
     def use_file( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
         raise NotImplementedError()
+
+    def use_files( self, file_infos:List[FileInfo] ) -> List[bool]:
+        """ Batch version of use_file(). Override it if a filter can decide for many items at once """
+        return [ self.use_file( file_info[0], file_info[1], file_info[2] ) is not False for file_info in file_infos ]
+
+    def requires_stats( self ) -> bool:
+        """ Return True to let the traversal collect the stat fields of the FileInfo items passed to use_files() """
+        return False
+
+    def reads_file_contents( self ) -> bool:
+        """ Return True if use_files() reads the files, lets the processing loop order the items by disk layout """
+        return False
     
 class ProcessorSubWindow(FesSubWindow):   
     def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
@@ -113,6 +1278,23 @@ class ProcessorSubWindow(FesSubWindow):
     @abc.abstractclassmethod
     def process( self, abs_file_path:str, rel_file_path:str, level:int ) -> None:
         raise NotImplementedError()    
+
+    def requires_stats( self ) -> bool:
+        """ Return True to let the traversal collect stats, see FilterSubWindow.requires_stats() """
+        return False
+
+    def reads_file_contents( self ) -> bool:
+        """ Return True if process() reads the files, see FilterSubWindow.reads_file_contents() """
+        return False
+
+    def process_file_info( self, file_info:FileInfo ) -> None:
+        """ Called by the processing loop. Override it to use the collected is_dir flag and stat fields """
+        self.process( file_info[0], file_info[1], file_info[2] )
+
+    def is_idempotent( self ) -> bool:
+        """ Return True if process_file_info() may be called again for an item after it raised, i.e. nothing was changed
+        (files, counters, output) before the failure. Only then transient I/O errors are retried """
+        return False
     
     def before_processing( self ) -> None:
         """ Called each time BEFORE the processing of the directory starts """
@@ -122,6 +1304,53 @@ class ProcessorSubWindow(FesSubWindow):
         """ Called each time AFTER the processing of the directory ended """
         pass
 
+class ReportFileChooser(QWidget):
+    """ Report format and file selection, stored in the settings of the owning sub window """
+
+    def __init__(self, sub_window:FesSubWindow):
+        QWidget.__init__(self)
+        self._sub_window = sub_window
+
+        self._format = QComboBox()
+        self._format.addItem("None")
+        for format_ in ReportWriter.FORMATS:
+            if format_ != "Parquet" or pyarrow is not None:
+                self._format.addItem(format_)
+        self._format.setCurrentText( sub_window.settings_value("report_format", "None") )
+        self._format.currentTextChanged.connect( lambda changed_text: sub_window.set_settings_value("report_format", changed_text) )
+
+        self._file_path = QLineEdit()
+        self._file_path.setReadOnly(True)
+        self._file_path.setStyleSheet("min-width: 240px")
+        self._file_path.setText( sub_window.settings_value("report_file_path", "") )
+        select_file_path_button = QPushButton("Change")
+        select_file_path_button.clicked.connect(self._select_file_path)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget( QLabel("Write report (the console only shows a summary):") )
+        layout.addWidget( self._format )
+        layout.addWidget( self._file_path )
+        layout.addWidget( select_file_path_button )
+        self.setLayout( layout )
+
+    def enabled( self ) -> bool:
+        return self._format.currentText() != "None"
+
+    def open_writer( self ) -> Union[None, ReportWriter]:
+        """ Returns a new writer or None if no report is configured """
+        if not self.enabled():
+            return None
+        if not self._file_path.text():
+            raise ValueError(f'{self._sub_window.name()}: Please select a report file!')
+        return ReportWriter( self._file_path.text(), self._format.currentText() )
+
+    def _select_file_path(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Select Report File", self._file_path.text(), "Reports (*.csv *.jsonl *.parquet)")
+        file_path = os.path.abspath( file_path ) if file_path else ""
+        self._file_path.setText( file_path )
+        self._sub_window.set_settings_value("report_file_path", file_path)
+
 class FesConsoleSubWindow(BasicSubWindow):
     def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
         BasicSubWindow.__init__(self, parent, flags)
@@ -142,7 +1371,8 @@ class FesConsoleSubWindow(BasicSubWindow):
         return "Console"
     
     def append( self, html_text:str ) -> "FesConsoleSubWindow":
-        self._console_text_edit.append( html_text )
+        with self.main_window().profiler().section("console"):
+            self._console_text_edit.append( html_text )
 
     def reset( self ) -> "FesConsoleSubWindow":
         self._console_text_edit.setHtml("")
@@ -167,34 +1397,86 @@ class NotesSubWindow(BasicSubWindow):
         return "Notes"
 
 class FesDirChooser(BasicSubWindow):
-    """ The fundamental widget for choosing the base directory """
+    """ The fundamental widget for choosing the base directories """
     def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
         BasicSubWindow.__init__(self, parent, flags)
 
         # build UI
-        self._base_directory = QLineEdit()
-        self._base_directory.setReadOnly(True)
-        self._base_directory.setStyleSheet("min-width: 240px;")
-        self._base_directory.setText(fes_settings.value("base_directory", ""))
+        self._base_directories = QListWidget()
+        self._base_directories.setStyleSheet("min-width: 240px;")
+        self._base_directories.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self._base_directories.addItems( configured_base_directories() )
 
-        select_directory_button = QPushButton("Select Directory")
+        select_directory_button = QPushButton("Add Directory")
         select_directory_button.clicked.connect(self.select_directory_button_clicked)
 
-        self._process_button = QPushButton("Process directory")
-        self._process_button.clicked.connect(self.process_button_clicked)
-        self._process_button.setDisabled(self._base_directory.text() == "")
+        remove_directories_button = QPushButton("Remove Selected")
+        remove_directories_button.clicked.connect(self._remove_directories_button_clicked)
 
-        error_timeout = QDoubleSpinBox()
-        error_timeout.setMinimum(0.0)
-        error_timeout.setValue( float( fes_settings.value("error_timeout", 0.5) ) )
-        error_timeout.valueChanged.connect( lambda changed_value: self.main_window().set_error_timeout( changed_value ) )
+        self._process_button = QPushButton("Process directories")
+        self._process_button.clicked.connect(self.process_button_clicked)
+        self._process_button.setDisabled(self._base_directories.count() == 0)
+
+        max_retries = QSpinBox()
+        max_retries.setRange(0, 10)
+        max_retries.setValue( fes_settings.value("error_max_retries", 2, int) )
+        max_retries.valueChanged.connect( lambda changed_value: fes_settings.setValue("error_max_retries", changed_value) )
+
+        retry_backoff = QDoubleSpinBox()
+        retry_backoff.setMinimum(0.0)
+        retry_backoff.setValue( fes_settings.value("error_retry_backoff", 0.5, float) )
+        retry_backoff.valueChanged.connect( lambda changed_value: fes_settings.setValue("error_retry_backoff", changed_value) )
+
+        abort_threshold = QSpinBox()
+        abort_threshold.setRange(0, 1000000)
+        abort_threshold.setValue( fes_settings.value("error_abort_threshold", 0, int) )
+        abort_threshold.valueChanged.connect( lambda changed_value: fes_settings.setValue("error_abort_threshold", changed_value) )
+
+        read_order = QComboBox()
+        for read_order_name in READ_ORDERS:
+            read_order.addItem(read_order_name)
+        read_order.setCurrentText( fes_settings.value("read_order", READ_ORDERS[0]) )
+        read_order.currentTextChanged.connect( lambda changed_text: fes_settings.setValue("read_order", changed_text) )
+
+        self._error_report_path = QLineEdit()
+        self._error_report_path.setReadOnly(True)
+        self._error_report_path.setText( fes_settings.value("error_report_path", "") )
+        select_error_report_path_button = QPushButton("Change")
+        select_error_report_path_button.clicked.connect(self._select_error_report_path)
+
+        profile_export_format = QComboBox()
+        profile_export_format.addItem("None")
+        profile_export_format.addItem("JSON")
+        profile_export_format.addItem("Chrome trace")
+        profile_export_format.setCurrentText( fes_settings.value("profile_export_format", "None") )
+        profile_export_format.currentTextChanged.connect( lambda changed_text: fes_settings.setValue("profile_export_format", changed_text) )
+
+        self._profile_export_path = QLineEdit()
+        self._profile_export_path.setReadOnly(True)
+        self._profile_export_path.setText( fes_settings.value("profile_export_path", "") )
+        select_profile_export_path_button = QPushButton("Change")
+        select_profile_export_path_button.clicked.connect(self._select_profile_export_path)
 
         layout = QVBoxLayout()
-        layout.addWidget(QLabel("Timeout on error [sec]:"))
-        layout.addWidget(error_timeout)
-        layout.addWidget(QLabel("Base Directory:"))
-        layout.addWidget(self._base_directory)
+        layout.addWidget(QLabel("Order of reading stages (Deduplicator, DICOM Filter, ...):"))
+        layout.addWidget(read_order)
+        layout.addWidget(QLabel("Retries on transient I/O errors:"))
+        layout.addWidget(max_retries)
+        layout.addWidget(QLabel("Retry backoff [sec] (doubled per retry):"))
+        layout.addWidget(retry_backoff)
+        layout.addWidget(QLabel("Abort after errors (0: never):"))
+        layout.addWidget(abort_threshold)
+        layout.addWidget(QLabel("Error report (CSV, optional):"))
+        layout.addWidget(self._error_report_path)
+        layout.addWidget(select_error_report_path_button)
+        layout.addWidget(QLabel("Export processing profile:"))
+        layout.addWidget(profile_export_format)
+        layout.addWidget(self._profile_export_path)
+        layout.addWidget(select_profile_export_path_button)
+        layout.addWidget(QLabel("Base Directories (scanned in parallel, one worker per device):"))
+        layout.addWidget(self._base_directories)
         layout.addWidget(select_directory_button)
+        layout.addWidget(remove_directories_button)
         layout.addWidget(self._process_button)
         layout.addStretch()
 
@@ -210,10 +1492,36 @@ class FesDirChooser(BasicSubWindow):
         self.main_window().start_processing()
 
     def select_directory_button_clicked(self):
-        dir = str (QFileDialog.getExistingDirectory(self, "Select Directory", directory=self._base_directory.text() ) )
-        self._base_directory.setText(dir)
-        self._process_button.setDisabled(self._base_directory.text() == "")
-        self.main_window().set_base_directory(dir, False)
+        base_directories = self._directories()
+        dir = str (QFileDialog.getExistingDirectory(self, "Select Directory", directory=base_directories[-1] if base_directories else "" ) )
+        if dir:
+            self.main_window().set_base_directories(base_directories + [dir], False)
+            self._update_directories()
+
+    def _remove_directories_button_clicked(self):
+        selected_directories = [ item.text() for item in self._base_directories.selectedItems() ]
+        self.main_window().set_base_directories([ dir for dir in self._directories() if dir not in selected_directories ], False)
+        self._update_directories()
+
+    def _directories(self) -> List[str]:
+        return [ self._base_directories.item(row).text() for row in range(self._base_directories.count()) ]
+
+    def _update_directories(self):
+        self._base_directories.clear()
+        self._base_directories.addItems( self.main_window().base_directories() )
+        self._process_button.setDisabled(self._base_directories.count() == 0)
+
+    def _select_profile_export_path(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Select Profile File", self._profile_export_path.text(), "JSON (*.json)")
+        file_path = os.path.abspath( file_path ) if file_path else ""
+        self._profile_export_path.setText( file_path )
+        fes_settings.setValue("profile_export_path", file_path)
+
+    def _select_error_report_path(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Select Error Report File", self._error_report_path.text(), "CSV (*.csv)")
+        file_path = os.path.abspath( file_path ) if file_path else ""
+        self._error_report_path.setText( file_path )
+        fes_settings.setValue("error_report_path", file_path)
 
 class FilePrinter(ProcessorSubWindow):
     def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
@@ -221,9 +1529,22 @@ class FilePrinter(ProcessorSubWindow):
         
         self._num_dirs = 0
         self._num_files = 0
+        self._report_writer:Union[None, ReportWriter] = None
+
+        self._report_file_chooser = ReportFileChooser(self)
+
+        self._hash_method = QComboBox()
+        self._hash_method.addItem("None")
+        self._hash_method.addItem("md5")
+        self._hash_method.addItem("sha1")
+        self._hash_method.setCurrentText( self.settings_value( "hash_method", "None" ) )
+        self._hash_method.currentTextChanged.connect( lambda changed_text: self.set_settings_value("hash_method", changed_text) )
 
         layout = QVBoxLayout()
         layout.addWidget(QLabel(self.description()))
+        layout.addWidget(self._report_file_chooser)
+        layout.addWidget(QLabel("Hash column of the report:"))
+        layout.addWidget(self._hash_method)
         layout.addStretch()
 
         widget = QWidget()
@@ -232,25 +1553,54 @@ class FilePrinter(ProcessorSubWindow):
         self.setWidget(widget)        
                 
     def description( self ) -> str:
-        return "Prints the relative path and level for each file into the console"
+        return "Prints the relative path and level for each file into the console or a report file"
+
+    def requires_stats( self ) -> bool:
+        return self._report_file_chooser.enabled()
+
+    def reads_file_contents( self ) -> bool:
+        return self._report_file_chooser.enabled() and self._hash_method.currentText() != "None"
     
     def process( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
-        if os.path.isdir( abs_file_path ):
+        self.process_file_info( FileInfo( abs_file_path, rel_file_path, level, os.path.isdir( abs_file_path ) ) )
+
+    def process_file_info( self, file_info:FileInfo ) -> None:
+        if file_info.is_dir:
             prefix = "Directory"
             self._num_dirs += 1
-        elif os.path.isfile( abs_file_path ):
+        else:
             prefix = "File"
             self._num_files += 1
-        self.main_window().console().append( f'{prefix} {rel_file_path} at level {level})' )
+        if self._report_writer is None:
+            self.main_window().console().append( f'{prefix} {file_info.rel_path} at level {file_info.level})' )
+            return
+
+        size, mtime = file_info.size, file_info.mtime
+        if size is None:
+            file_stat = os.stat( file_info.abs_path )
+            size, mtime = file_stat.st_size, file_stat.st_mtime
+        hash = None
+        if self._hash_method.currentText() != "None" and not file_info.is_dir:
+            hash = hash_file( file_info.abs_path, self._hash_method.currentText() )
+            self.main_window().profiler().add_bytes_read( size )
+        self._report_writer.write( file_info.abs_path, file_info.level, prefix.lower(), size, mtime, hash )
 
     def before_processing( self ) -> None:
         self._num_dirs = 0
         self._num_files = 0
         self.main_window().console().reset()
-        self.main_window().console().append("Items in directory <b>"+self.main_window().base_directory()+"</b>:")
+        self._report_writer = self._report_file_chooser.open_writer()
+        if self._report_writer is None:
+            self.main_window().console().append("Items in <b>"+", ".join(self.main_window().base_directories())+"</b>:")
+        else:
+            self.main_window().console().append(f"Writing items in <b>"+", ".join(self.main_window().base_directories())+f"</b> to <b>{self._report_writer.file_path()}</b>")
 
     def post_processing( self ) -> None:
-        self.main_window().console().append(f"Overall statistics for directory <b>"+self.main_window().base_directory()+"</b>:")
+        if self._report_writer is not None:
+            self._report_writer.close()
+            self.main_window().console().append(f"{self._report_writer.num_rows()} rows written to <b>{self._report_writer.file_path()}</b>")
+            self._report_writer = None
+        self.main_window().console().append(f"Overall statistics for <b>"+", ".join(self.main_window().base_directories())+"</b>:")
         self.main_window().console().append(f"{self._num_dirs+self._num_files} items found")
         self.main_window().console().append(f"{self._num_dirs} directories found")
         self.main_window().console().append(f"{self._num_files} files found")
@@ -271,7 +1621,7 @@ class ChronologicSorter(ProcessorSubWindow):
         self._output_dir_path = QLineEdit()
         self._output_dir_path.setReadOnly(True)
         self._output_dir_path.setStyleSheet("min-width: 240px")
-        self._output_dir_path.setText( self.settings_value("output_dir_path") )
+        self._output_dir_path.setText( self.settings_value("output_dir_path", "") )
         select_output_dir_path_button = QPushButton("Change")
         select_output_dir_path_button.clicked.connect(self._select_output_dir_path)
         file_action = QComboBox()
@@ -300,6 +1650,9 @@ class ChronologicSorter(ProcessorSubWindow):
 
     def description( self ) -> str:
         return "Sorts files in folders chronologically with its creation or modified date"
+
+    def reads_file_contents( self ) -> bool:
+        return self.settings_value("file_action", "Move files") == "Copy files"
     
     def before_processing( self ) -> None:
         self.main_window().console().reset()
@@ -329,7 +1682,11 @@ class ChronologicSorter(ProcessorSubWindow):
             os.makedirs( file_output_dir_path, exist_ok= False )
         file_action = self.settings_value("file_action", "Move files")
         self.main_window().console().append(f'{"Moving" if file_action == "Move files" else "Copying"} <b>{rel_file_path}</b> to <b>{file_output_path}</b>')
-        shutil.move( abs_file_path, file_output_path ) if file_action == "Move files" else shutil.copy( abs_file_path, file_output_path )
+        if file_action == "Move files":
+            shutil.move( abs_file_path, file_output_path )
+        else:
+            copy_file( abs_file_path, file_output_path )
+            self.main_window().profiler().add_bytes_read( file_stat.st_size )
 
     def _select_output_dir_path(self):
         dir = str (QFileDialog.getExistingDirectory(self, "Select Directory", directory=self._output_dir_path.text() ) )
@@ -349,13 +1706,15 @@ class DirectoryComparer(ProcessorSubWindow):
         # internal state
         self._num_dirs_missing = 0
         self._num_files_missing = 0
+        self._report_writer:Union[None, ReportWriter] = None
 
         # build widgets
+        self._report_file_chooser = ReportFileChooser(self)
         target_dir_path_label = QLabel("Target Directory:")
         self._target_dir_path = QLineEdit()
         self._target_dir_path.setReadOnly(True)
         self._target_dir_path.setStyleSheet("min-width: 240px")
-        self._target_dir_path.setText( self.settings_value("target_dir_path") )
+        self._target_dir_path.setText( self.settings_value("target_dir_path", "") )
         select_target_dir_path_button = QPushButton("Change")
         select_target_dir_path_button.clicked.connect(self._select_target_dir_path)
         layout = QVBoxLayout()
@@ -363,6 +1722,7 @@ class DirectoryComparer(ProcessorSubWindow):
         layout.addWidget(target_dir_path_label)
         layout.addWidget(self._target_dir_path)
         layout.addWidget(select_target_dir_path_button)
+        layout.addWidget(self._report_file_chooser)
         layout.addStretch()
 
         widget = QWidget()
@@ -382,22 +1742,34 @@ class DirectoryComparer(ProcessorSubWindow):
         self.main_window().console().reset()
 
         validate_dir( self._target_dir_path.text(), self.name() )
+        self._report_writer = self._report_file_chooser.open_writer()
         self.main_window().console().append(f"Missing files and directories in {self._target_dir_path.text()}")
+        if self._report_writer is not None:
+            self.main_window().console().append(f"Writing missing items to <b>{self._report_writer.file_path()}</b>")
+
+    def requires_stats( self ) -> bool:
+        return self._report_file_chooser.enabled()
 
     def process( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
+        self.process_file_info( FileInfo( abs_file_path, rel_file_path, level, os.path.isdir( abs_file_path ) ) )
+
+    def process_file_info( self, file_info:FileInfo ) -> None:
         validate_dir( self._target_dir_path.text(), self.name() )
 
         target_dir_path = self._target_dir_path.text()
-        abs_file_path_in_target_dir = os.path.abspath( target_dir_path + "/" + rel_file_path )
+        abs_file_path_in_target_dir = os.path.abspath( target_dir_path + "/" + file_info.rel_path )
 
         if not os.path.exists( abs_file_path_in_target_dir ):
-            if os.path.isdir( abs_file_path ):
+            if file_info.is_dir:
                 type_ = "directory"
                 self._num_dirs_missing += 1
-            elif os.path.isfile( abs_file_path ):
+            else:
                 type_ = "file"
                 self._num_files_missing += 1
-            self.main_window().console().append(f'Missing {type_} "{rel_file_path}"')
+            if self._report_writer is None:
+                self.main_window().console().append(f'Missing {type_} "{file_info.rel_path}"')
+            else:
+                self._report_writer.write( file_info.abs_path, file_info.level, type_, file_info.size, file_info.mtime )
 
     def _select_target_dir_path(self):
         dir = str (QFileDialog.getExistingDirectory(self, "Select Directory", directory=self._target_dir_path.text() ) )
@@ -411,9 +1783,13 @@ class DirectoryComparer(ProcessorSubWindow):
         self.set_settings_value("target_dir_path", dir)
         
     def post_processing( self ) -> None:
+        if self._report_writer is not None:
+            self._report_writer.close()
+            self.main_window().console().append(f"{self._report_writer.num_rows()} missing items written to <b>{self._report_writer.file_path()}</b>")
+            self._report_writer = None
         validate_dir( self._target_dir_path.text(), self.name() )
         
-        self.main_window().console().append(f"Overall missing statistics for directory <b>"+self._target_dir_path.text()+"</b> compared to <b>"+self.main_window().base_directory()+"</b>:")
+        self.main_window().console().append(f"Overall missing statistics for directory <b>"+self._target_dir_path.text()+"</b> compared to <b>"+", ".join(self.main_window().base_directories())+"</b>:")
         self.main_window().console().append(f"{self._num_dirs_missing+self._num_files_missing} items mssing")
         self.main_window().console().append(f"{self._num_dirs_missing} directories missing")
         self.main_window().console().append(f"{self._num_files_missing} files missing")
@@ -423,8 +1799,9 @@ class Deduplicator(ProcessorSubWindow):
         ProcessorSubWindow.__init__(self, parent, flags)
 
         # internal state
-        self._hasher:FileHash = None
-        self._hashes:dict[str, str] = {}
+        self._digests:Union[None, DigestIndex] = None
+        self._backed_up_paths:set = set()
+        self._reference_index:Union[None, ReferenceIndex] = None
         self._total_files = 0
         self._files_removed = 0
 
@@ -438,21 +1815,60 @@ class Deduplicator(ProcessorSubWindow):
         self._hash_method.currentTextChanged.connect( lambda changed_text: self.set_settings_value("hash_method", changed_text) )
         self._hash_method.setCurrentText( self.settings_value( "hash_method", "md5" ) )
 
+        self._memory_budget = QSpinBox()
+        self._memory_budget.setRange(1, 1024 * 1024)
+        self._memory_budget.setValue( self.settings_value( "memory_budget", 512, int ) )
+        self._memory_budget.valueChanged.connect( lambda changed_value: self.set_settings_value("memory_budget", changed_value) )
+
+        self._mode = QComboBox()
+        self._mode.addItem("Within base directories")
+        self._mode.addItem("Against reference archive")
+        self._mode.addItem("Within base directories and against reference archive")
+        self._mode.setCurrentText( self.settings_value( "mode", "Within base directories" ) )
+        self._mode.currentTextChanged.connect( lambda changed_text: self.set_settings_value("mode", changed_text) )
+
         self._backup_dir_path = QLineEdit()
         self._backup_dir_path.setReadOnly(True)
         self._backup_dir_path.setStyleSheet("min-width: 240px")
-        self._backup_dir_path.setText( self.settings_value("backup_dir_path") )
+        self._backup_dir_path.setText( self.settings_value("backup_dir_path", "") )
         select_backup_dir_path_button = QPushButton("Change")
         select_backup_dir_path_button.clicked.connect(self._select_backup_dir_path)
 
+        self._reference_dir_path = QLineEdit()
+        self._reference_dir_path.setReadOnly(True)
+        self._reference_dir_path.setStyleSheet("min-width: 240px")
+        self._reference_dir_path.setText( self.settings_value("reference_dir_path", "") )
+        select_reference_dir_path_button = QPushButton("Change")
+        select_reference_dir_path_button.clicked.connect(self._select_reference_dir_path)
+
+        self._reference_index_path = QLineEdit()
+        self._reference_index_path.setReadOnly(True)
+        self._reference_index_path.setStyleSheet("min-width: 240px")
+        self._reference_index_path.setText( self.settings_value("reference_index_path", "") )
+        select_reference_index_path_button = QPushButton("Change")
+        select_reference_index_path_button.clicked.connect(self._select_reference_index_path)
+        build_reference_index_button = QPushButton("Build/Update Index")
+        build_reference_index_button.clicked.connect(self._build_reference_index)
+
         layout = QVBoxLayout()
         layout.addWidget( QLabel( self.description() ) )
         layout.addWidget( self._dry_run )
         layout.addWidget( QLabel("Hashing algorithm") )
         layout.addWidget( self._hash_method )
+        layout.addWidget( QLabel("Memory for hashes [MB] (more is kept on disk):") )
+        layout.addWidget( self._memory_budget )
+        layout.addWidget( QLabel("Find duplicates:") )
+        layout.addWidget( self._mode )
         layout.addWidget( QLabel("Backup Directory:") )
         layout.addWidget( self._backup_dir_path )
         layout.addWidget( select_backup_dir_path_button )
+        layout.addWidget( QLabel("Reference Archive Directory:") )
+        layout.addWidget( self._reference_dir_path )
+        layout.addWidget( select_reference_dir_path_button )
+        layout.addWidget( QLabel("Reference Archive Index File:") )
+        layout.addWidget( self._reference_index_path )
+        layout.addWidget( select_reference_index_path_button )
+        layout.addWidget( build_reference_index_button )
         layout.addStretch()
 
         widget = QWidget()
@@ -471,58 +1887,261 @@ class Deduplicator(ProcessorSubWindow):
         
         self.set_settings_value("backup_dir_path", dir)
 
+    def _select_reference_dir_path(self):
+        dir = str (QFileDialog.getExistingDirectory(self, "Select Directory", directory=self._reference_dir_path.text() ) )
+        dir = os.path.abspath( dir ) if dir else ""
+        self._reference_dir_path.setText( dir )
+        self.set_settings_value("reference_dir_path", dir)
+
+    def _select_reference_index_path(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Select Index File", self._reference_index_path.text(), "SQLite (*.sqlite)", options=QFileDialog.DontConfirmOverwrite)
+        file_path = os.path.abspath( file_path ) if file_path else ""
+        self._reference_index_path.setText( file_path )
+        self.set_settings_value("reference_index_path", file_path)
+
+    def _build_reference_index(self):
+        try:
+            validate_dir( self._reference_dir_path.text(), self.name() + ": " )
+            if not self._reference_index_path.text():
+                raise ValueError(f'{self.name()}: Please select an index file!')
+        except ValueError as e:
+            QMessageBox.critical( self, "Error", str(e) )
+            return
+
+        progress_dialog = QProgressDialog("Indexing reference archive ...", "Cancel", 0, 0, self)
+        progress_dialog.setWindowTitle("File Essentials - Indexing")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.show()
+
+        def progress( num_files:int ) -> bool:
+            progress_dialog.setLabelText(f'Indexed {num_files} files')
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+
+        reference_index = None
+        try:
+            reference_index = ReferenceIndex( self._reference_index_path.text() )
+            num_files = reference_index.build( self._reference_dir_path.text(), progress )
+        except (sqlite3.Error, OSError) as e:
+            # e.g. an existing file that is not an index
+            QMessageBox.critical( self, "Error", f'{self.name()}: Could not build the index "{self._reference_index_path.text()}": {e}' )
+            return
+        finally:
+            if reference_index is not None:
+                reference_index.close()
+            progress_dialog.close()
+        self.main_window().console().append(f'Indexed {num_files} files of reference archive <b>{self._reference_dir_path.text()}</b>')
+
     def description( self ) -> str:
-        return "Removes duplicate files from a directory"
+        return "Removes duplicate files from a directory or files already contained in a reference archive"
+
+    def reads_file_contents( self ) -> bool:
+        return True
+
+    def is_idempotent( self ) -> bool:
+        # the counters are updated last, backups are complete or absent and a repeated lookup finds the same first file
+        return True
     
     def before_processing( self ) -> None:
-        self._hasher = FileHash(self._hash_method.currentText())
-        self._hashes = {}
         self._total_files = 0
         self._files_removed = 0
+        self._backed_up_paths = set()
         self.main_window().console().reset()
-        self.main_window().console().append(f'Removing duplicates in directory <b>{self.main_window().base_directory()}</b>')
+        if self._mode.currentText() != "Within base directories":
+            index_path = self._reference_index_path.text()
+            if not os.path.isfile( index_path ):
+                raise ValueError(f'{self.name()}: Please build the reference archive index first!')
+            self._reference_index = ReferenceIndex( index_path )
+            self._reference_index.load()
+            # files of the archive would be found as their own duplicates
+            reference_directory = self._reference_index.reference_directory()
+            for base_directory in map( os.path.abspath, self.main_window().base_directories() ):
+                if reference_directory is not None and ( base_directory == reference_directory or \
+                        is_sub_directory( base_directory, reference_directory ) or is_sub_directory( reference_directory, base_directory ) ):
+                    self._reference_index.close()
+                    self._reference_index = None
+                    raise ValueError(f'{self.name()}: The base directory "{base_directory}" overlaps the reference archive "{reference_directory}"!')
+            self.main_window().console().append(f'Removing files contained in reference archive <b>{self._reference_index.reference_directory()}</b>')
+        self.main_window().console().append(f'Removing duplicates in <b>{", ".join(self.main_window().base_directories())}</b>')
+        # created last: process() skips all files if a check above failed
+        self._digests = DigestIndex( hashlib.new( self._hash_method.currentText() ).digest_size, self._memory_budget.value() * 1024 * 1024 )
 
     def process( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
-        if os.path.isfile( abs_file_path ):
-            hash = self._hasher.hash_file(abs_file_path)
-            self._total_files += 1
-            if hash in self._hashes:              
-                self._files_removed += 1
-                dry_run = self._dry_run.isChecked()
-                prefix = "[DRY RUN] Would remove" if dry_run else "Removing"
-                self.main_window().console().append(f'{prefix} duplicate file <b>{rel_file_path}</b> with hash {hash}')
-
-                # make backup
-                backup_dir = self._backup_dir_path.text()
-                if os.path.isdir( backup_dir ):
-                    first_file_abs_path = self._hashes[hash]
-                    _, first_file_ext = os.path.splitext(first_file_abs_path)
-                    backup_first_file = os.path.abspath( backup_dir + "/" + hash + "_0" + first_file_ext )
-                    if not os.path.exists(backup_first_file):
-                        self.main_window().console().append(f'Copying first file from {first_file_abs_path} to {backup_first_file}')
-                        shutil.copy( first_file_abs_path, backup_first_file )
-
-                    i = 1
-                    _, ext = os.path.splitext(abs_file_path)
-                    while True:
-                        backup_file_path = os.path.abspath( backup_dir + "/" + hash + "_" + str(i) + ext )
-                        if not os.path.exists( backup_file_path ):
-                            break
-                        i += 1
-                    self.main_window().console().append(f'Copying duplicate file from {rel_file_path} to {backup_file_path}')
-                    shutil.copy( abs_file_path, backup_file_path )
-
-                if dry_run is False:
-                    os.remove( abs_file_path )
-            else:
-                self._hashes[hash] = abs_file_path
+        if self._digests is None:
+            return
+        # one stat for the type check and the size
+        try:
+            file_stat = os.stat( abs_file_path )
+        except OSError:
+            return
+        if not stat.S_ISREG( file_stat.st_mode ):
+            return
+        size = file_stat.st_size
+        mode = self._mode.currentText()
+        hash = None
+        first_file_abs_path = None
+
+        # reference archive: only hash on a size match
+        if mode != "Within base directories" and self._reference_index is not None:
+            if self._reference_index.contains_size( size ):
+                hash = self._hash_file( abs_file_path, size )
+                # candidates have the same size
+                first_file_abs_path = self._reference_index.find_duplicate( abs_file_path, size, hash, self._hash_method.currentText(), lambda path: self._hash_file( path, size ) )
+
+        if first_file_abs_path is None and mode != "Against reference archive":
+            hash = hash if hash is not None else self._hash_file( abs_file_path, size )
+            first_file_abs_path = self._digests.get_or_add( bytes.fromhex( hash ), abs_file_path )
+
+        if first_file_abs_path is not None:
+            self._remove_duplicate( abs_file_path, rel_file_path, hash, first_file_abs_path )
+        self._total_files += 1
+
+    def _hash_file( self, abs_file_path:str, size:int ) -> str:
+        hash = hash_file( abs_file_path, self._hash_method.currentText() )
+        self.main_window().profiler().add_bytes_read( size )
+        return hash
+
+    def _remove_duplicate( self, abs_file_path:str, rel_file_path:str, hash:str, first_file_abs_path:str ) -> None:
+        dry_run = self._dry_run.isChecked()
+        prefix = "[DRY RUN] Would remove" if dry_run else "Removing"
+        self.main_window().console().append(f'{prefix} duplicate file <b>{rel_file_path}</b> with hash {hash}')
+
+        # make backup
+        backup_dir = self._backup_dir_path.text()
+        if os.path.isdir( backup_dir ):
+            _, first_file_ext = os.path.splitext(first_file_abs_path)
+            backup_first_file = os.path.abspath( backup_dir + "/" + hash + "_0" + first_file_ext )
+            if not os.path.exists(backup_first_file):
+                self.main_window().console().append(f'Copying first file from {first_file_abs_path} to {backup_first_file}')
+                self._copy_backup( first_file_abs_path, backup_first_file )
+
+            # a retry after a failed removal must not back up the duplicate twice
+            if abs_file_path not in self._backed_up_paths:
+                i = 1
+                _, ext = os.path.splitext(abs_file_path)
+                while True:
+                    backup_file_path = os.path.abspath( backup_dir + "/" + hash + "_" + str(i) + ext )
+                    if not os.path.exists( backup_file_path ):
+                        break
+                    i += 1
+                self.main_window().console().append(f'Copying duplicate file from {rel_file_path} to {backup_file_path}')
+                self._copy_backup( abs_file_path, backup_file_path )
+                self._backed_up_paths.add( abs_file_path )
+
+        if dry_run is False:
+            os.remove( abs_file_path )
+        self._files_removed += 1
     
+    def _copy_backup( self, source_path:str, backup_path:str ) -> None:
+        """ Copies to a temporary name first, so a failed copy never leaves a partial backup """
+        temporary_path = backup_path + ".part"
+        try:
+            copy_file( source_path, temporary_path )
+            os.replace( temporary_path, backup_path )
+        except OSError:
+            if os.path.exists( temporary_path ):
+                os.remove( temporary_path )
+            raise
+
     def post_processing(self) -> None:
+        if self._reference_index is not None:
+            self._reference_index.close()
+            self._reference_index = None
+        if self._digests is not None:
+            if self._digests.num_spilled():
+                self.main_window().console().append(f'{self._digests.num_spilled()} of {len( self._digests )} hashes were kept on disk, consider a larger memory budget')
+            self._digests.close()
+            self._digests = None
         dry_run = self._dry_run.isChecked()
         prefix = "[DRY RUN] Would have removed" if dry_run else "Removed"
-        self.main_window().console().append(f'In directory {self.main_window().base_directory()}: {prefix} {self._files_removed} duplicates out of {self._total_files} files')
+        self.main_window().console().append(f'In {", ".join(self.main_window().base_directories())}: {prefix} {self._files_removed} duplicates out of {self._total_files} files')
         self._dry_run.setChecked(True)
       
+class NearDuplicateImageFinder(ProcessorSubWindow):
+    def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
+        ProcessorSubWindow.__init__(self, parent, flags)
+
+        # internal state
+        self._hasher:Union[None, PerceptualHasher] = None
+        self._tree = BKTree()
+        self._cache:Union[None, PerceptualHashCache] = None
+        self._image_extensions:set = set()
+        self._num_images = 0
+        self._num_near_duplicates = 0
+
+        # build widgets
+        self._hash_method = QComboBox()
+        for method in PerceptualHasher.METHODS:
+            self._hash_method.addItem( method )
+        self._hash_method.setCurrentText( self.settings_value( "hash_method", "dHash" ) )
+        self._hash_method.currentTextChanged.connect( lambda changed_text: self.set_settings_value("hash_method", changed_text) )
+
+        self._max_distance = QSpinBox()
+        self._max_distance.setRange( 0, 32 )
+        self._max_distance.setValue( self.settings_value( "max_distance", 6 ) )
+        self._max_distance.valueChanged.connect( lambda new_value: self.set_settings_value("max_distance", new_value) )
+
+        layout = QVBoxLayout()
+        layout.addWidget( QLabel( self.description() ) )
+        layout.addWidget( QLabel("Perceptual hash:") )
+        layout.addWidget( self._hash_method )
+        layout.addWidget( QLabel("Maximum Hamming distance (of 64 bits):") )
+        layout.addWidget( self._max_distance )
+        layout.addStretch()
+
+        widget = QWidget()
+        widget.setLayout( layout )
+
+        self.setWidget(widget)        
+
+    def name( self ) -> str:
+        return "NearDuplicateImageFinder"
+
+    def description( self ) -> str:
+        return "Reports re-encoded or resized copies of images using perceptual hashes"
+
+    def reads_file_contents( self ) -> bool:
+        return True
+
+    def before_processing( self ) -> None:
+        self._hasher = PerceptualHasher( self._hash_method.currentText() )
+        self._tree = BKTree()
+        self._image_extensions = set( "." + bytes(image_format).decode().lower() for image_format in QImageReader.supportedImageFormats() )
+        self._num_images = 0
+        self._num_near_duplicates = 0
+        cache_dir_path = QStandardPaths.writableLocation( QStandardPaths.CacheLocation )
+        os.makedirs( cache_dir_path, exist_ok=True )
+        self._cache = PerceptualHashCache( os.path.join( cache_dir_path, "perceptual_hashes.sqlite" ) )
+        self.main_window().console().reset()
+        self.main_window().console().append(f'Searching near-duplicate images in <b>{", ".join(self.main_window().base_directories())}</b>')
+
+    def process( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
+        _, ext = os.path.splitext( abs_file_path )
+        if ext.lower() not in self._image_extensions or not os.path.isfile( abs_file_path ):
+            return
+        file_stat = os.stat( abs_file_path )
+        hash = self._cache.get( file_stat, self._hasher.method() )
+        if hash is None:
+            hash = self._hasher.hash_file( abs_file_path )
+            if hash is None:
+                return
+            self.main_window().profiler().add_bytes_read( file_stat.st_size )
+            self._cache.put( file_stat, self._hasher.method(), hash )
+        self._num_images += 1
+
+        matches = self._tree.search( hash, self._max_distance.value() )
+        if matches:
+            self._num_near_duplicates += 1
+            distance, similar_rel_file_path = matches[0]
+            self.main_window().console().append(f'<b>{rel_file_path}</b> is similar to <b>{similar_rel_file_path}</b> (distance {distance})')
+        self._tree.add( hash, rel_file_path )
+
+    def post_processing( self ) -> None:
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        self.main_window().console().append(f'{self._num_near_duplicates} near-duplicates found among {self._num_images} images')
+
 class DicomFilter(FilterSubWindow):
     
     def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
@@ -539,11 +2158,16 @@ class DicomFilter(FilterSubWindow):
 
     def description( self ) -> str:
         return "Checks for valid DICOM files"
+
+    def reads_file_contents( self ) -> bool:
+        return True
     
     def use_file( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
         if not os.path.isfile( abs_file_path ):
             return False        
         try:
+            # preamble and "DICM" prefix
+            self.main_window().profiler().add_bytes_read( 132 )
             return pydicom.misc.is_dicom(abs_file_path)
         except pydicom.errors.InvalidDicomError:
             return False
@@ -553,6 +2177,11 @@ class BasicFilter(FilterSubWindow):
     def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
         FilterSubWindow.__init__(self, parent, flags)
 
+        # internal state, compiled whenever the inputs change
+        self._allowed_file_extensions:set = set()
+        self._include_matcher = PathMatcher([])
+        self._exclude_matcher = PathMatcher([])
+
         choice_label = QLabel("Select target file items:")
         self._choice = QComboBox()
         self._choice.addItem("Files and Folders")
@@ -564,8 +2193,22 @@ class BasicFilter(FilterSubWindow):
 
         extensions_label = QLabel("Enter allowed extensions (e.g. \"*.jpg; *.txt\")")
         self._extensions_input = QLineEdit()
-        self._extensions_input.textChanged.connect( lambda changed_text: self.set_settings_value("extensions", changed_text) )
         self._extensions_input.setText( self.settings_value( "allowed_extensions", "*.*" ) )
+        self._extensions_input.textChanged.connect( lambda changed_text: self._patterns_changed("allowed_extensions", changed_text) )
+
+        include_patterns_label = QLabel("Include files matching (e.g. \"IMG_*.JPG; photos/**\", empty for all):")
+        self._include_patterns_input = QLineEdit()
+        self._include_patterns_input.setText( self.settings_value( "include_patterns", "" ) )
+        self._include_patterns_input.textChanged.connect( lambda changed_text: self._patterns_changed("include_patterns", changed_text) )
+
+        exclude_patterns_label = QLabel("Exclude files and folders matching (e.g. \"**/tmp/**; *.bak\"):")
+        self._exclude_patterns_input = QLineEdit()
+        self._exclude_patterns_input.setText( self.settings_value( "exclude_patterns", "" ) )
+        self._exclude_patterns_input.textChanged.connect( lambda changed_text: self._patterns_changed("exclude_patterns", changed_text) )
+
+        self._case_sensitive = QCheckBox("Case sensitive patterns")
+        self._case_sensitive.setChecked( self.settings_value( "case_sensitive", False ) )
+        self._case_sensitive.toggled.connect( lambda checked: self._patterns_changed("case_sensitive", checked) )
 
         maximum_recursion_level_label = QLabel("Maximum recursion level:")
         self._maximum_recursion_level = QSpinBox()
@@ -573,11 +2216,18 @@ class BasicFilter(FilterSubWindow):
         self._maximum_recursion_level.setValue( self.settings_value( "maximum_recursion_level", -1 ) )
         self._maximum_recursion_level.valueChanged.connect( lambda new_value: self.set_settings_value("maximum_recursion_level", new_value) )
 
+        self._compile_patterns()
+
         layout = QVBoxLayout()
         layout.addWidget( choice_label )
         layout.addWidget( self._choice )
         layout.addWidget( extensions_label )
         layout.addWidget( self._extensions_input )
+        layout.addWidget( include_patterns_label )
+        layout.addWidget( self._include_patterns_input )
+        layout.addWidget( exclude_patterns_label )
+        layout.addWidget( self._exclude_patterns_input )
+        layout.addWidget( self._case_sensitive )
         layout.addWidget( maximum_recursion_level_label )
         layout.addWidget( self._maximum_recursion_level )
         layout.addStretch()
@@ -591,33 +2241,186 @@ class BasicFilter(FilterSubWindow):
         return "Exposes some basic filtering options"
     
     def use_file( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:       
-        if self._choice.currentText() == "Files and Folders":
-            valid = True
-        elif self._choice.currentText() == "Only Folders":
-            valid = os.path.isdir( abs_file_path )
-        elif self._choice.currentText() == "Only Files":
-            valid = os.path.isfile( abs_file_path )
-
-        if valid:        
-            maximum_recursion_level = self.settings_value( "maximum_recursion_level", -1 )
-            if maximum_recursion_level > -1 and level > maximum_recursion_level:
-                valid = False
-
-        if valid and os.path.isfile( abs_file_path ):
-            allowed_file_extensions:list[str] = self.settings_value( "allowed_extensions", "*.*" ).split(";")
-            if len( allowed_file_extensions ) > 0:
-                allowed_file_extensions = [ allowed_file_extension.strip().replace("*.", ".").lower() for allowed_file_extension in allowed_file_extensions ]        
-                _, file_ext = os.path.splitext(abs_file_path)
-                valid = file_ext.lower() in allowed_file_extensions or ".*" in allowed_file_extensions       
-
+        return self.use_files( [ FileInfo( abs_file_path, rel_file_path, level, os.path.isdir( abs_file_path ) ) ] )[0]
+
+    def use_files( self, file_infos:List[FileInfo] ) -> List[bool]:
+        choice = self._choice.currentText()
+        maximum_recursion_level = self._maximum_recursion_level.value()
+        all_extensions_allowed = ".*" in self._allowed_file_extensions
+
+        valid = []
+        for file_info in file_infos:
+            if choice == "Only Folders":
+                item_valid = file_info.is_dir
+            elif choice == "Only Files":
+                item_valid = not file_info.is_dir
+            else:
+                item_valid = True
+
+            if item_valid and maximum_recursion_level > -1 and file_info.level > maximum_recursion_level:
+                item_valid = False
+
+            if item_valid and not file_info.is_dir and not all_extensions_allowed:
+                _, file_ext = os.path.splitext( file_info.rel_path )
+                item_valid = file_ext.lower() in self._allowed_file_extensions
+            valid.append( item_valid )
+
+        # patterns are matched once per batch
+        if self._include_matcher:
+            candidates = [ i for i, file_info in enumerate( file_infos ) if valid[i] and not file_info.is_dir ]
+            for i, included in zip( candidates, self._include_matcher.match_batch( [ file_infos[i].rel_path for i in candidates ] ) ):
+                valid[i] = included
+        if self._exclude_matcher:
+            candidates = [ i for i in range( len( file_infos ) ) if valid[i] ]
+            for i, excluded in zip( candidates, self._exclude_matcher.match_batch( [ file_infos[i].rel_path for i in candidates ] ) ):
+                valid[i] = not excluded
 
         return valid
 
+    def _patterns_changed( self, name:str, value:Any ) -> None:
+        self.set_settings_value(name, value)
+        self._compile_patterns()
+
+    def _compile_patterns( self ) -> None:
+        allowed_file_extensions = [ allowed_file_extension.strip().replace("*.", ".").lower() for allowed_file_extension in self._extensions_input.text().split(";") ]
+        self._allowed_file_extensions = set( allowed_file_extension for allowed_file_extension in allowed_file_extensions if allowed_file_extension ) or { ".*" }
+        case_sensitive = self._case_sensitive.isChecked()
+        self._include_matcher = PathMatcher( self._include_patterns_input.text().split(";"), case_sensitive )
+        self._exclude_matcher = PathMatcher( self._exclude_patterns_input.text().split(";"), case_sensitive )
+
+
+class StatFilter(FilterSubWindow):
+    
+    def __init__(self, parent=None, flags:Qt.WindowFlags=Qt.WindowFlags()):
+        FilterSubWindow.__init__(self, parent, flags)
+
+        # internal state, compiled whenever the inputs change
+        self._checks:List[Callable[[FileInfo], bool]] = []
+
+        self._min_size = QDoubleSpinBox()
+        self._min_size.setRange( 0.0, 1e9 )
+        self._min_size.setSuffix( " MB" )
+        self._min_size.setValue( self.settings_value( "min_size_mb", 0.0 ) )
+        self._min_size.valueChanged.connect( lambda new_value: self._input_changed("min_size_mb", new_value) )
+
+        self._max_size = QDoubleSpinBox()
+        self._max_size.setRange( 0.0, 1e9 )
+        self._max_size.setSuffix( " MB" )
+        self._max_size.setValue( self.settings_value( "max_size_mb", 0.0 ) )
+        self._max_size.valueChanged.connect( lambda new_value: self._input_changed("max_size_mb", new_value) )
+
+        self._modified_after_enabled = QCheckBox("Modified after:")
+        self._modified_after_enabled.setChecked( self.settings_value( "modified_after_enabled", False ) )
+        self._modified_after_enabled.toggled.connect( lambda checked: self._input_changed("modified_after_enabled", checked) )
+        self._modified_after = QDateTimeEdit()
+        self._modified_after.setCalendarPopup( True )
+        self._modified_after.setDateTime( QDateTime.fromSecsSinceEpoch( self.settings_value( "modified_after", 0 ) ) )
+        self._modified_after.dateTimeChanged.connect( lambda changed_date_time: self._input_changed("modified_after", changed_date_time.toSecsSinceEpoch()) )
+
+        self._modified_before_enabled = QCheckBox("Modified before:")
+        self._modified_before_enabled.setChecked( self.settings_value( "modified_before_enabled", False ) )
+        self._modified_before_enabled.toggled.connect( lambda checked: self._input_changed("modified_before_enabled", checked) )
+        self._modified_before = QDateTimeEdit()
+        self._modified_before.setCalendarPopup( True )
+        self._modified_before.setDateTime( QDateTime.fromSecsSinceEpoch( self.settings_value( "modified_before", int( time.time() ) ) ) )
+        self._modified_before.dateTimeChanged.connect( lambda changed_date_time: self._input_changed("modified_before", changed_date_time.toSecsSinceEpoch()) )
+
+        self._owner = QLineEdit()
+        self._owner.setText( self.settings_value( "owner", "" ) )
+        self._owner.textChanged.connect( lambda changed_text: self._input_changed("owner", changed_text) )
+        if pwd is None:
+            self._owner.setDisabled( True )
+            self._owner.setToolTip( "File owners are not available on this platform" )
+
+        self._compile_predicate()
+
+        layout = QVBoxLayout()
+        layout.addWidget( QLabel( self.description() ) )
+        layout.addWidget( QLabel("Minimum file size (0 for no limit):") )
+        layout.addWidget( self._min_size )
+        layout.addWidget( QLabel("Maximum file size (0 for no limit):") )
+        layout.addWidget( self._max_size )
+        layout.addWidget( self._modified_after_enabled )
+        layout.addWidget( self._modified_after )
+        layout.addWidget( self._modified_before_enabled )
+        layout.addWidget( self._modified_before )
+        layout.addWidget( QLabel("Owner (user name or id, empty for any):") )
+        layout.addWidget( self._owner )
+        layout.addStretch()
+
+        widget = QWidget()
+        widget.setLayout( layout )
+
+        self.setWidget(widget)
+
+    def name( self ) -> str:
+        return "StatFilter"
+
+    def description( self ) -> str:
+        return "Filters files by size, modification time and owner (folders pass)"
+
+    def requires_stats( self ) -> bool:
+        return len( self._checks ) > 0
+
+    def use_file( self, abs_file_path:str, rel_file_path:str, level:int ) -> bool:
+        try:
+            file_stat = os.stat( abs_file_path )
+        except OSError:
+            return False
+        return self.use_files( [ FileInfo( abs_file_path, rel_file_path, level, os.path.isdir( abs_file_path ),
+                                           file_stat.st_size, file_stat.st_mtime, file_stat.st_ctime, file_stat.st_uid ) ] )[0]
+
+    def use_files( self, file_infos:List[FileInfo] ) -> List[bool]:
+        checks = self._checks
+        if not checks:
+            return [True] * len( file_infos )
+        # items without stats (stat failed) can not be accepted
+        return [ file_info.is_dir or ( file_info.size is not None and all( check(file_info) for check in checks ) ) for file_info in file_infos ]
+
+    def _input_changed( self, name:str, value:Any ) -> None:
+        self.set_settings_value(name, value)
+        self._compile_predicate()
+
+    def _compile_predicate( self ) -> None:
+        checks = []
+        min_size = int( self._min_size.value() * 1024 * 1024 )
+        if min_size > 0:
+            checks.append( lambda file_info: file_info.size >= min_size )
+        max_size = int( self._max_size.value() * 1024 * 1024 )
+        if max_size > 0:
+            checks.append( lambda file_info: file_info.size <= max_size )
+        if self._modified_after_enabled.isChecked():
+            modified_after = float( self._modified_after.dateTime().toSecsSinceEpoch() )
+            checks.append( lambda file_info: file_info.mtime >= modified_after )
+        if self._modified_before_enabled.isChecked():
+            modified_before = float( self._modified_before.dateTime().toSecsSinceEpoch() )
+            checks.append( lambda file_info: file_info.mtime < modified_before )
+        owner = self._owner.text().strip()
+        if owner and pwd is not None:
+            uid = self._owner_uid( owner )
+            checks.append( lambda file_info: file_info.uid == uid )
+        self._checks = checks
+
+    def _owner_uid( self, owner:str ) -> Union[None, int]:
+        if owner.isdigit():
+            return int( owner )
+        try:
+            return pwd.getpwnam( owner ).pw_uid
+        except KeyError:
+            # unknown users own no files
+            return None
 
 class FesMainWindow(QMainWindow):
+
+    FILTER_BATCH_SIZE = 256
+
     def __init__(self):
         super().__init__()
 
+        # internal state
+        self._profiler = ProcessingProfiler()
+        self._errors = ErrorCollector()
+
         # build widgets
         self._mdi = QMdiArea()
         self._mdi.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
@@ -646,12 +2449,14 @@ class FesMainWindow(QMainWindow):
         # add filters
         self.create_sub_window( DicomFilter )
         self.create_sub_window( BasicFilter )
+        self.create_sub_window( StatFilter )
 
         # add processor
         self.create_sub_window( FilePrinter )
         self.create_sub_window( ChronologicSorter )
         self.create_sub_window( DirectoryComparer )
         self.create_sub_window( Deduplicator )
+        self.create_sub_window( NearDuplicateImageFinder )
 
         # finalize
         self.setCentralWidget(self._mdi)    
@@ -718,7 +2523,7 @@ class FesMainWindow(QMainWindow):
             sub_window_visible = sub_window.name() in active_filters
 
         elif sub_window_class == ProcessorSubWindow:
-            active_processor_name = fes_settings.value(f'active_processor', None)
+            active_processor_name = fes_settings.value(f'active_processor', None, str)
             #print(f'active_processor: {active_processor_name}')
             sub_window_visible = sub_window.name() == active_processor_name
 
@@ -743,7 +2548,7 @@ class FesMainWindow(QMainWindow):
 
         # save active processor (and disable the currently active)
         elif sub_window.sub_window_class() == ProcessorSubWindow and visible:
-            active_processor_name = fes_settings.value(f'active_processor', None)
+            active_processor_name = fes_settings.value(f'active_processor', None, str)
             if active_processor_name is not None and active_processor_name != sub_window.name():
                 self._set_sub_window_visible_by_class_and_name( ProcessorSubWindow, active_processor_name, False )
                                 
@@ -771,39 +2576,54 @@ class FesMainWindow(QMainWindow):
                     action.setText( filter_name )
 
     def base_directory( self ) -> Union[str, None]:
-        return fes_settings.value("base_directory", None)
+        """ The first base directory """
+        base_directories = self.base_directories()
+        return base_directories[0] if base_directories else None
+
+    def base_directories( self ) -> List[str]:
+        return configured_base_directories()
 
     def set_base_directory( self, base_directory:Union[str,None], start_processing:bool=True ) -> None:        
         if base_directory:
-            if not os.path.isdir( base_directory ):
+            self.set_base_directories( [ base_directory ], start_processing )
+
+    def set_base_directories( self, base_directories:List[str], start_processing:bool=True ) -> None:
+        # only new directories are checked, saved ones may be temporarily unavailable (e.g. an unmounted volume)
+        configured_directories = [ os.path.abspath( directory ) for directory in configured_base_directories() ]
+        for base_directory in base_directories:
+            if os.path.abspath( base_directory ) not in configured_directories and not os.path.isdir( base_directory ):
                 error_dialog = QErrorMessage()
                 error_dialog.setWindowTitle( "Error" )
                 error_dialog.setModal(True)
                 error_dialog.showMessage(f'Not a directory: "{base_directory}"')
                 return
-            base_directory = os.path.abspath( base_directory )
-            fes_settings.setValue( "base_directory", base_directory )
-            if start_processing:
-                self.start_processing()                
-
-    def error_timeout( self ) -> float:
-        return float( fes_settings.value("error_timeout", 0.5) )
-
-    def set_error_timeout( self, error_timeout:float ) -> None:        
-        fes_settings.setValue( "error_timeout", float(error_timeout) )
+        # nested directories would be collected twice
+        base_directories = normalize_base_directories( base_directories )
+        fes_settings.setValue( "base_directories", base_directories )
+        fes_settings.setValue( "base_directory", base_directories[0] if base_directories else "" )
+        if start_processing and base_directories:
+            self.start_processing()                
 
     def console( self ) -> FesConsoleSubWindow:
         return self._sub_window_by_class_and_name( BasicSubWindow, "Console" )
 
+    def profiler( self ) -> ProcessingProfiler:
+        """ The profiler of the current (or last) processing run """
+        return self._profiler
+
+    def errors( self ) -> ErrorCollector:
+        """ The errors of the current (or last) processing run """
+        return self._errors
+
     def start_processing(self):
-        # base_directory error handling
-        base_directory = fes_settings.value("base_directory")
-        base_directory = os.path.abspath( base_directory )
+        # base_directories error handling
+        base_directories = normalize_base_directories( self.base_directories() )
         error = None
-        if base_directory == "":
+        if len( base_directories ) == 0:
             error = f'Please choose a base directory first'
-        elif not os.path.isdir( base_directory ):
-            error = f'Not a directory: "{base_directory}"'
+        for base_directory in base_directories:
+            if not os.path.isdir( base_directory ):
+                error = f'Not a directory: "{base_directory}"'
 
         if error:
             error_dialog = QErrorMessage()
@@ -821,79 +2641,189 @@ class FesMainWindow(QMainWindow):
         progress_dialog.setAutoClose(False)
         progress_dialog.show()
 
+        # setup profiling
+        profiler = self._profiler
+        profile_export_format = fes_settings.value("profile_export_format", "None")
+        profiler.reset( record_trace=profile_export_format == "Chrome trace" )
+
+        # setup error handling
+        errors = self._errors
+        errors.reset( fes_settings.value("error_max_retries", 2, int), fes_settings.value("error_retry_backoff", 0.5, float), fes_settings.value("error_abort_threshold", 0, int) )
+
+        # get active filters
+        active_filter_names:list[str] = fes_settings.value(f'active_filters', [])
+        active_filters:list[FilterSubWindow] = [ self._sub_window_by_class_and_name(FilterSubWindow, active_filter_name) for active_filter_name in active_filter_names]
+        filter_stage_names = [ f'filter:{filter.name()}' for filter in active_filters ]
+
+        # get active processor
+        active_processor_name = fes_settings.value(f'active_processor', None, str)        
+        active_processor:ProcessorSubWindow = self._sub_window_by_class_and_name( ProcessorSubWindow, active_processor_name )
+        processor_stage_name = f'processor:{active_processor_name}'
+
+        # collect stats only if needed
+        with_stats = any( filter.requires_stats() for filter in active_filters ) or ( active_processor is not None and active_processor.requires_stats() )
+
         # collect files
         i = 0
-        file_infos:list[tuple[str, str, int]] = []
+        file_infos = FileInfoStore(base_directories, with_stats)
         progress_dialog.setLabelText("Collecting files")
-        for root, dirnames, filenames in os.walk(base_directory):     
+        for listing in profiler.timed_iter("traversal", walk_directories_listings(base_directories, with_stats=with_stats)):
             if progress_dialog.wasCanceled():
                 return
             else:
-                level = root[len(base_directory):].count(os.sep)
-                for basename in dirnames + filenames:
-                    abs_path = os.path.join(root, basename)
-                    rel_path = abs_path.replace( base_directory, "" )
-                    rel_path = rel_path.replace( "\\", "/" )[1:]
-                    file_infos.append( (abs_path, rel_path, level) )
+                if listing is not None:
+                    file_infos.add_listing( *listing )
                         
                 i = i + 1 if i < 100 else 0
                 progress_dialog.setValue(i)
             QApplication.processEvents()
             
 
+        # order the reads by disk layout if a stage reads the file contents
+        read_order = fes_settings.value("read_order", READ_ORDERS[0])
+        order = None
+        if read_order != READ_ORDERS[0] and ( any( filter.reads_file_contents() for filter in active_filters ) or ( active_processor is not None and active_processor.reads_file_contents() ) ):
+            progress_dialog.setLabelText(f'Ordering reads ({read_order})')
+            progress_dialog.setRange(0, len(file_infos))
+
+            def progress( num_items:int ) -> bool:
+                progress_dialog.setValue( num_items )
+                QApplication.processEvents()
+                return not progress_dialog.wasCanceled()
+
+            with profiler.section("read_order"):
+                order = disk_read_order( file_infos, read_order, progress )
+            if order is None:
+                return
+
         # process files
         progress_dialog.setLabelText("Processing files")
         progress_dialog.setValue(0)
         progress_dialog.setRange(0, len(file_infos))
-
-        # get active filters
-        active_filter_names:list[str] = fes_settings.value(f'active_filters', [])
-        active_filters:list[FilterSubWindow] = [ self._sub_window_by_class_and_name(FilterSubWindow, active_filter_name) for active_filter_name in active_filter_names]
-
-        # get active processor
-        active_processor_name = fes_settings.value(f'active_processor', None)        
-        active_processor:ProcessorSubWindow = self._sub_window_by_class_and_name( ProcessorSubWindow, active_processor_name )
         
         if active_processor:
             try:                    
-                active_processor.before_processing()
+                with profiler.section( processor_stage_name + ".before_processing" ):
+                    active_processor.before_processing()
             except Exception as e:                
                 progress_dialog.setLabelText(f'Error: {e}')
-                time.sleep(self.error_timeout())
+                errors.record( "", processor_stage_name + ".before_processing", e )
 
-        for i, file_info in enumerate(file_infos):            
-            if progress_dialog.wasCanceled():
+        for batch_start in range(0, len(file_infos), FesMainWindow.FILTER_BATCH_SIZE):
+            if progress_dialog.wasCanceled() or errors.abort_requested():
                 break
-            else:
-                try:                    
-                    progress_dialog.setLabelText(f'Processing {file_info[1]}')
-                    
-                    # check with filters for usage
-                    use_file = True
-                    for filter in active_filters:
-                        if filter.use_file( file_info[0], file_info[1], file_info[2] ) is False:
-                            use_file = False
-                            break
-                    
-                    if use_file and active_processor:
-                        active_processor.process( file_info[0], file_info[1], file_info[2] )
-                except Exception as e:                
-                    progress_dialog.setLabelText(f'Error: {e}')
-                    # wait on errors #TODO make configurable?
-                    time.sleep(self.error_timeout())
+            batch_indices = range(batch_start, min(batch_start + FesMainWindow.FILTER_BATCH_SIZE, len(file_infos)))
+            batch = [ file_infos[int(order[i]) if order is not None else i] for i in batch_indices ]
+            self._process_batch( batch, [1] * len(batch), batch_start, active_filters, filter_stage_names, active_processor, processor_stage_name, progress_dialog )
+
+            # retry items whose backoff has elapsed
+            self._process_retries( active_filters, filter_stage_names, active_processor, processor_stage_name, progress_dialog )
 
-                progress_dialog.setValue( i )
+        # wait for the remaining retries without blocking the GUI
+        while errors.pending_retries() and not progress_dialog.wasCanceled() and not errors.abort_requested():
+            progress_dialog.setLabelText(f'Waiting to retry {errors.pending_retries()} items')
             QApplication.processEvents()
+            time.sleep( min( 0.05, errors.seconds_to_next_retry() ) )
+            self._process_retries( active_filters, filter_stage_names, active_processor, processor_stage_name, progress_dialog )
+        errors.drop_retries( lambda file_info: file_info[0] )
 
         if active_processor:
             try:                    
-                active_processor.post_processing()
+                with profiler.section( processor_stage_name + ".post_processing" ):
+                    active_processor.post_processing()
             except Exception as e:                
                 progress_dialog.setLabelText(f'Error: {e}')
-                time.sleep(self.error_timeout())
+                errors.record( "", processor_stage_name + ".post_processing", e )
+
+        # report the errors
+        if errors.abort_requested():
+            self.console().append( f'<b>Processing aborted after {len( errors.errors() )} errors</b>' )
+        for line in errors.summary_lines():
+            self.console().append( line )
+        error_report_path = fes_settings.value("error_report_path", "")
+        if errors.errors() and error_report_path:
+            try:
+                errors.export_csv( error_report_path )
+                self.console().append( f'Error report written to <b>{error_report_path}</b>' )
+            except OSError as e:
+                self.console().append( f'Error: Could not write error report to "{error_report_path}": {e}' )
+
+        # report the profile
+        for line in profiler.summary_lines():
+            self.console().append( line )
+        profile_export_path = fes_settings.value("profile_export_path", "")
+        if profile_export_format != "None" and profile_export_path:
+            try:
+                profiler.export_chrome_trace( profile_export_path ) if profile_export_format == "Chrome trace" else profiler.export_json( profile_export_path )
+                self.console().append( f'Profile written to <b>{profile_export_path}</b>' )
+            except OSError as e:
+                self.console().append( f'Error: Could not write profile to "{profile_export_path}": {e}' )
         progress_dialog.close()
         progress_dialog = None
 
+    def _process_batch( self, batch:List[FileInfo], attempts:List[int], batch_start:Union[None, int], active_filters:List[FilterSubWindow], filter_stage_names:List[str],
+                        active_processor:Union[None, ProcessorSubWindow], processor_stage_name:str, progress_dialog:QProgressDialog ) -> None:
+        """ Filters and processes the batch, failing items are handed to the error collector. batch_start is the index of the
+        first item for the progress dialog (None for retries) """
+        profiler = self._profiler
+        use_files = self._filter_batch( batch, attempts, active_filters, filter_stage_names, progress_dialog )
+
+        for i, (file_info, attempt, use_file) in enumerate(zip(batch, attempts, use_files)):
+            if progress_dialog.wasCanceled() or self._errors.abort_requested():
+                break
+            start_ns = profiler.start("progress")
+            progress_dialog.setLabelText(f'Processing {file_info[1]}' if attempt == 1 else f'Retrying {file_info[1]} (attempt {attempt})')
+            profiler.stop("progress", start_ns)
+
+            if use_file and active_processor:
+                start_ns = profiler.start(processor_stage_name)
+                try:
+                    active_processor.process_file_info( file_info )
+                except Exception as e:
+                    progress_dialog.setLabelText(f'Error: {e}')
+                    self._errors.handle( file_info, file_info[0], processor_stage_name, e, attempt, active_processor.is_idempotent() )
+                finally:
+                    profiler.stop(processor_stage_name, start_ns)
+
+            start_ns = profiler.start("progress")
+            if batch_start is not None:
+                progress_dialog.setValue( batch_start + i )
+            QApplication.processEvents()
+            profiler.stop("progress", start_ns)
+
+    def _process_retries( self, active_filters:List[FilterSubWindow], filter_stage_names:List[str], active_processor:Union[None, ProcessorSubWindow],
+                          processor_stage_name:str, progress_dialog:QProgressDialog ) -> None:
+        due_retries = self._errors.due_retries()
+        if due_retries:
+            batch, attempts = zip( *due_retries )
+            self._process_batch( list( batch ), list( attempts ), None, active_filters, filter_stage_names, active_processor, processor_stage_name, progress_dialog )
+
+    def _filter_batch( self, batch:List[FileInfo], attempts:List[int], active_filters:List[FilterSubWindow], filter_stage_names:List[str], progress_dialog:QProgressDialog ) -> List[bool]:
+        """ Applies the filters in order, each filter decides for all items of the batch not rejected so far """
+        use_files = [True] * len(batch)
+        for filter, filter_stage_name in zip(active_filters, filter_stage_names):
+            indices = [ i for i, use_file in enumerate(use_files) if use_file ]
+            if not indices:
+                break
+            start_ns = self._profiler.start(filter_stage_name)
+            try:
+                results = filter.use_files( [ batch[i] for i in indices ] )
+            except Exception:
+                # find the failing items
+                results = []
+                for i in indices:
+                    try:
+                        results.append( filter.use_file( batch[i][0], batch[i][1], batch[i][2] ) is not False )
+                    except Exception as e:
+                        results.append( False )
+                        progress_dialog.setLabelText(f'Error: {e}')
+                        self._errors.handle( batch[i], batch[i][0], filter_stage_name, e, attempts[i] )
+            finally:
+                self._profiler.stop(filter_stage_name, start_ns)
+            for i, use_file in zip(indices, results):
+                use_files[i] = use_file
+        return use_files
+
     def changeEvent(self, event):        
         if event.type() == QEvent.WindowStateChange:
             fes_settings.setValue("window_state", self.saveState())
@@ -0,0 +1,120 @@
+""" Makes src/main/python/main.py importable without a GUI. The Qt, fbs and pydicom modules are replaced by stubs if
+they are not installed, the tests only cover the non-GUI parts of the module """
+import sys, os, types, importlib.util
+import pytest
+
+class _Stub:
+    """ Accepts any construction, attribute access, call and flag combination """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __or__(self, other):
+        return self
+
+class _StubMeta(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+def _stub_module(name:str) -> types.ModuleType:
+    module = types.ModuleType(name)
+
+    def module_getattr(attribute_name:str):
+        if attribute_name.startswith("__"):
+            raise AttributeError(attribute_name)
+        # subclassable stub classes, e.g. QMdiSubWindow
+        return _StubMeta(attribute_name, (_Stub,), {})
+
+    module.__getattr__ = module_getattr
+    sys.modules[name] = module
+    return module
+
+class _MemorySettings:
+    """ QSettings replacement keeping the values in memory """
+    UserScope = 0
+    IniFormat = 1
+
+    def __init__(self, *args):
+        self._values = {}
+
+    def allKeys(self):
+        return list(self._values)
+
+    def value(self, key, default_value=None):
+        return self._values.get(key, default_value)
+
+    def setValue(self, key, value):
+        self._values[key] = value
+
+    def sync(self):
+        pass
+
+    def clear(self):
+        self._values.clear()
+
+_qt_stubbed = importlib.util.find_spec("PyQt5") is None
+if _qt_stubbed:
+    for name in [ "PyQt5", "PyQt5.QtCore", "PyQt5.QtGui", "PyQt5.QtWidgets" ]:
+        _stub_module(name)
+    sys.modules["PyQt5"].QtCore = sys.modules["PyQt5.QtCore"]
+    sys.modules["PyQt5"].QtGui = sys.modules["PyQt5.QtGui"]
+    sys.modules["PyQt5.QtCore"].QSettings = _MemorySettings
+    sys.modules["PyQt5.QtCore"].QCoreApplication = type("QCoreApplication", (), { "instance": staticmethod(lambda: None) })
+if importlib.util.find_spec("fbs_runtime") is None:
+    for name in [ "fbs_runtime", "fbs_runtime.application_context", "fbs_runtime.application_context.PyQt5" ]:
+        _stub_module(name)
+if importlib.util.find_spec("pydicom") is None:
+    _stub_module("pydicom")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "main", "python"))
+
+class _FakeInput(_Stub):
+    """ Input widget replacement holding a single value, e.g. the text of a QLineEdit or the state of a QCheckBox """
+    def __init__(self, *args, **kwargs):
+        self._value = None
+
+    def _set_value(self, value):
+        self._value = value
+
+    def _get_value(self):
+        return self._value
+
+    setText = setCurrentText = setValue = setChecked = setDateTime = _set_value
+    text = currentText = value = isChecked = dateTime = _get_value
+
+class _FakeDateTime:
+    def __init__(self, secs_since_epoch):
+        self._secs_since_epoch = secs_since_epoch
+
+    @staticmethod
+    def fromSecsSinceEpoch(secs_since_epoch):
+        return _FakeDateTime(secs_since_epoch)
+
+    def toSecsSinceEpoch(self):
+        return self._secs_since_epoch
+
+@pytest.fixture
+def gui_main(monkeypatch):
+    """ Lets sub windows be created in the tests: with Qt on an offscreen QApplication, without Qt on input widget
+    replacements that keep their values. The settings start empty and are kept in memory """
+    import main
+    if _qt_stubbed:
+        for name in [ "QLineEdit", "QComboBox", "QCheckBox", "QSpinBox", "QDoubleSpinBox", "QDateTimeEdit" ]:
+            monkeypatch.setattr(main, name, _FakeInput)
+        monkeypatch.setattr(main, "QDateTime", _FakeDateTime)
+    else:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        global _app
+        _app = QApplication.instance() or QApplication([])
+    monkeypatch.setattr(main, "fes_settings", main.FesSettings(_MemorySettings()))
+    return main
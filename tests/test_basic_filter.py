@@ -0,0 +1,41 @@
+import os
+from main import FileInfo
+
+def file_info(rel_path, is_dir=False):
+    return FileInfo("/base/" + rel_path, rel_path, rel_path.count("/"), is_dir)
+
+def create_filter(main, **values):
+    main.fes_settings.clear()
+    for name, value in values.items():
+        main.fes_settings.setValue("BasicFilter." + name, value)
+    return main.BasicFilter()
+
+def test_defaults_accept_everything(gui_main):
+    basic_filter = create_filter(gui_main)
+    file_infos = [ file_info("a", True), file_info("a/b.txt"), file_info("c") ]
+    assert basic_filter.use_files(file_infos) == [True, True, True]
+    assert basic_filter.use_files([]) == []
+
+def test_choice_extensions_and_level(gui_main):
+    file_infos = [ file_info("a", True), file_info("a/b.JPG"), file_info("a/c.txt"), file_info("a/d/e.jpg") ]
+    assert create_filter(gui_main, choice="Only Folders").use_files(file_infos) == [True, False, False, False]
+    assert create_filter(gui_main, choice="Only Files", allowed_extensions="*.jpg; *.png").use_files(file_infos) == [False, True, False, True]
+    assert create_filter(gui_main, maximum_recursion_level=1).use_files(file_infos) == [True, True, True, False]
+
+def test_include_and_exclude_patterns(gui_main):
+    file_infos = [ file_info("photos", True), file_info("photos/IMG_1.jpg"), file_info("photos/tmp", True), file_info("photos/tmp/IMG_2.jpg"), file_info("x.bak"), file_info("y.txt") ]
+    basic_filter = create_filter(gui_main, include_patterns="IMG_*; *.bak", exclude_patterns="**/tmp/**; *.bak")
+    # folders are not subject to the include patterns
+    assert basic_filter.use_files(file_infos) == [True, True, False, False, False, False]
+
+def test_case_sensitive_patterns(gui_main):
+    file_infos = [ file_info("a.TMP"), file_info("b.tmp") ]
+    assert create_filter(gui_main, exclude_patterns="*.tmp").use_files(file_infos) == [False, False]
+    assert create_filter(gui_main, exclude_patterns="*.tmp", case_sensitive=True).use_files(file_infos) == [True, False]
+
+def test_use_file_equals_use_files(gui_main, tmp_path):
+    os.makedirs(str(tmp_path / "d"))
+    (tmp_path / "d" / "x.tmp").write_bytes(b"")
+    basic_filter = create_filter(gui_main, exclude_patterns="*.tmp")
+    assert basic_filter.use_file(str(tmp_path / "d"), "d", 0)
+    assert not basic_filter.use_file(str(tmp_path / "d" / "x.tmp"), os.path.join("d", "x.tmp"), 1)
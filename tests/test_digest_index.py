@@ -0,0 +1,48 @@
+import hashlib, random, tracemalloc
+import pytest
+from main import DigestIndex
+
+def digests(num_digests, num_distinct, seed=1):
+    generator = random.Random(seed)
+    return [ hashlib.md5(str(generator.randrange(num_distinct)).encode()).digest() for _ in range(num_digests) ]
+
+@pytest.mark.parametrize("memory_budget", [ 1024 * 1024 * 1024, 1024 * 1024 ])
+def test_equals_dict(memory_budget):
+    index = DigestIndex(16, memory_budget)
+    expected = {}
+    try:
+        for number, digest in enumerate(digests(100000, 60000)):
+            path = f'/dir/ä/{number}'
+            assert index.get_or_add(digest, path) == expected.get(digest)
+            expected.setdefault(digest, path)
+        assert len(index) == len(expected)
+        if memory_budget < 1024 * 1024 * 1024:
+            assert index.num_spilled() > 0
+        else:
+            assert index.num_spilled() == 0
+    finally:
+        index.close()
+
+def test_memory_budget():
+    memory_budget = 1024 * 1024
+    all_digests = digests(40000, 40000)
+    tracemalloc.start()
+    try:
+        index = DigestIndex(16, memory_budget)
+        base_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for number, digest in enumerate(all_digests):
+            index.get_or_add(digest, str(number))
+        peak_size = tracemalloc.get_traced_memory()[1] - base_size
+        index.close()
+    finally:
+        tracemalloc.stop()
+    assert peak_size < memory_budget
+
+def test_wrong_digest_size():
+    index = DigestIndex(20, 1024 * 1024)
+    try:
+        with pytest.raises(ValueError):
+            index.get_or_add(b"0" * 16, "a")
+    finally:
+        index.close()
@@ -0,0 +1,37 @@
+import os
+from main import FileInfoStore, walk_directories_listings, disk_read_order, READ_ORDERS
+
+def collect(base_directory):
+    for number in range(50):
+        directory = os.path.join(base_directory, f'd{number % 5}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'f{number}'), "wb") as f:
+            f.write(b"1" * number)
+    file_infos = FileInfoStore([base_directory])
+    for listing in walk_directories_listings([base_directory]):
+        if listing is not None:
+            file_infos.add_listing(*listing)
+    return file_infos
+
+def test_inode_order(tmp_path):
+    file_infos = collect(str(tmp_path))
+    missing = next( index for index in range(len(file_infos)) if not file_infos.is_dir(index) )
+    os.remove(file_infos.abs_path(missing))
+    order = [ int(index) for index in disk_read_order(file_infos, READ_ORDERS[1]) ]
+    assert sorted(order) == list(range(len(file_infos)))
+    directories = [ index for index in range(len(file_infos)) if file_infos.is_dir(index) ]
+    # directories in traversal order first, the file that can not be stat'ed last
+    assert order[:len(directories)] == directories
+    assert order[-1] == missing
+    inodes = [ os.stat(file_infos.abs_path(index)).st_ino for index in order[len(directories):-1] ]
+    assert inodes == sorted(inodes)
+
+def test_extent_order(tmp_path):
+    file_infos = collect(str(tmp_path))
+    order = disk_read_order(file_infos, READ_ORDERS[2])
+    assert sorted(int(index) for index in order) == list(range(len(file_infos)))
+    assert all( file_infos.is_dir(int(index)) for index in order[:5] )
+
+def test_cancel(tmp_path):
+    file_infos = collect(str(tmp_path))
+    assert disk_read_order(file_infos, READ_ORDERS[1], progress=lambda num_items: False) is None
@@ -0,0 +1,68 @@
+import csv, errno, time
+from main import ErrorCollector, is_transient_error
+
+def test_transient_errors():
+    assert is_transient_error(OSError(errno.EIO, "io"))
+    assert is_transient_error(TimeoutError("timeout"))
+    assert not is_transient_error(PermissionError(errno.EACCES, "denied"))
+    assert not is_transient_error(FileNotFoundError(errno.ENOENT, "missing"))
+    assert not is_transient_error(ValueError("value"))
+
+def test_retry_with_backoff():
+    errors = ErrorCollector()
+    errors.reset(max_retries=2, retry_backoff=0.01)
+    assert errors.handle("item", "/item", "processor", OSError(errno.EIO, "io"), 1)
+    assert errors.due_retries() == []
+    assert errors.pending_retries() == 1
+    time.sleep(0.02)
+    assert errors.due_retries() == [ ("item", 2) ]
+    assert errors.handle("item", "/item", "processor", OSError(errno.EIO, "io"), 2)
+    time.sleep(0.03)
+    assert errors.due_retries() == [ ("item", 3) ]
+    # retries used up
+    assert not errors.handle("item", "/item", "processor", OSError(errno.EIO, "io"), 3)
+    assert [ (error.path, error.attempts) for error in errors.errors() ] == [ ("/item", 3) ]
+
+def test_no_retry():
+    errors = ErrorCollector()
+    errors.reset(max_retries=2)
+    assert not errors.handle("a", "/a", "processor", PermissionError(errno.EACCES, "denied"), 1)
+    assert not errors.handle("b", "/b", "processor", OSError(errno.EIO, "io"), 1, retry=False)
+    assert errors.pending_retries() == 0
+    assert len(errors.errors()) == 2
+
+def test_drop_retries():
+    errors = ErrorCollector()
+    errors.reset(max_retries=1, retry_backoff=60)
+    errors.handle("a", "/a", "filter", OSError(errno.EBUSY, "busy"), 1)
+    errors.drop_retries(lambda item: "/" + item)
+    assert errors.pending_retries() == 0
+    assert [ (error.path, error.stage, error.error) for error in errors.errors() ] == [ ("/a", "filter", "OSError") ]
+
+def test_abort_threshold():
+    errors = ErrorCollector()
+    errors.reset(abort_threshold=2)
+    errors.record("/a", "processor", ValueError("a"))
+    assert not errors.abort_requested()
+    errors.record("/b", "processor", ValueError("b"))
+    assert errors.abort_requested()
+    errors.reset()
+    for number in range(10):
+        errors.record(str(number), "processor", ValueError())
+    assert not errors.abort_requested()
+
+def test_report(tmp_path):
+    errors = ErrorCollector()
+    errors.reset()
+    assert errors.summary_lines() == []
+    for number in range(ErrorCollector.MAX_REPORTED_ERRORS + 5):
+        errors.record(f'/{number}', "processor", ValueError(f'error {number}'))
+    lines = errors.summary_lines()
+    assert len(lines) == ErrorCollector.MAX_REPORTED_ERRORS + 2
+    report_path = str(tmp_path / "errors.csv")
+    errors.export_csv(report_path)
+    with open(report_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == [ "path", "stage", "error", "message", "attempts" ]
+    assert rows[1] == [ "/0", "processor", "ValueError", "error 0", "1" ]
+    assert len(rows) == ErrorCollector.MAX_REPORTED_ERRORS + 6
@@ -0,0 +1,53 @@
+import os
+from main import FileInfoStore, walk_directories_listings
+
+def create_tree(root):
+    os.makedirs(os.path.join(root, "a", "b"))
+    os.makedirs(os.path.join(root, "c"))
+    for rel_path, content in [ ("f", b""), ("a/g", b"12"), ("a/b/h", b"123"), ("c/ä i", b"1") ]:
+        with open(os.path.join(root, *rel_path.split("/")), "wb") as f:
+            f.write(content)
+
+def collect(base_directories, with_stats=False):
+    file_infos = FileInfoStore(base_directories, with_stats)
+    for listing in walk_directories_listings(base_directories, with_stats=with_stats):
+        if listing is not None:
+            file_infos.add_listing(*listing)
+    return file_infos
+
+def walk_items(base_directory):
+    items = set()
+    for root, dirnames, filenames in os.walk(base_directory):
+        for name, is_dir in [ (name, True) for name in dirnames ] + [ (name, False) for name in filenames ]:
+            abs_path = os.path.join(root, name)
+            rel_path = os.path.relpath(abs_path, base_directory)
+            items.add( (abs_path, rel_path, rel_path.count(os.sep), is_dir) )
+    return items
+
+def test_items_equal_os_walk(tmp_path):
+    create_tree(str(tmp_path))
+    file_infos = collect([str(tmp_path)])
+    assert len(file_infos) == 7
+    assert set( (file_info.abs_path, file_info.rel_path, file_info.level, file_info.is_dir) for file_info in file_infos ) == walk_items(str(tmp_path))
+    for index, file_info in enumerate(file_infos):
+        assert file_infos[index] == file_info
+        assert file_info.size is None
+
+def test_stats(tmp_path):
+    create_tree(str(tmp_path))
+    file_infos = collect([str(tmp_path)], with_stats=True)
+    for file_info in file_infos:
+        file_stat = os.stat(file_info.abs_path)
+        assert file_info.size == file_stat.st_size
+        assert file_info.mtime == file_stat.st_mtime
+    sizes = { file_info.rel_path: file_info.size for file_info in file_infos if not file_info.is_dir }
+    assert sizes[os.path.join("a", "b", "h")] == 3
+
+def test_several_base_directories(tmp_path):
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    os.makedirs(first)
+    create_tree(second)
+    with open(os.path.join(first, "x"), "wb"):
+        pass
+    file_infos = collect([first, second])
+    assert set( (file_info.abs_path, file_info.rel_path, file_info.level, file_info.is_dir) for file_info in file_infos ) == walk_items(first) | walk_items(second)
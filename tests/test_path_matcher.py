@@ -0,0 +1,52 @@
+from main import PathMatcher
+
+def test_basename_patterns_match_in_any_directory():
+    matcher = PathMatcher(["*.tmp", "Thumbs.db"])
+    assert matcher.match("a.tmp")
+    assert matcher.match("x/y/a.tmp")
+    assert matcher.match("x/thumbs.db")
+    assert not matcher.match("a.tmp/b")
+
+def test_double_star_spans_directories():
+    matcher = PathMatcher(["build/**", "**/cache/*.bin"], case_sensitive=True)
+    assert matcher.match("build")
+    assert matcher.match("build/a/b")
+    assert matcher.match("cache/x.bin")
+    assert matcher.match("a/b/cache/x.bin")
+    assert not matcher.match("a/cache/sub/x.bin")
+    assert not matcher.match("Build/a")
+
+def test_single_star_stays_within_a_component():
+    matcher = PathMatcher(["src/*.py"])
+    assert matcher.match("src/main.py")
+    assert not matcher.match("src/sub/main.py")
+
+def test_match_batch_equals_match():
+    patterns = ["*.tmp", "a?c", "d[0-9]", "e[!x]f", "g/**", "**/h/*"]
+    rel_paths = ["x.tmp", "abc", "ac", "d1", "dx", "eyf", "exf", "g", "g/1/2", "q/h/i", "q/h/i/j", "", "zzz"]
+    matcher = PathMatcher(patterns)
+    assert matcher.match_batch(rel_paths) == [ matcher.match(rel_path) for rel_path in rel_paths ]
+
+def test_match_batch_with_empty_batch():
+    assert PathMatcher(["*"]).match_batch([]) == []
+    assert PathMatcher(["**"]).match_batch([]) == []
+    assert PathMatcher([]).match_batch([]) == []
+
+def test_negated_class_does_not_span_paths():
+    matcher = PathMatcher(["a[!x]b"])
+    assert matcher.match_batch(["a", "b", "zzz"]) == [False, False, False]
+    assert matcher.match_batch(["ayb", "axb"]) == [True, False]
+
+def test_negated_class_stays_within_a_component():
+    assert not PathMatcher(["x/a[!b]c"]).match("x/a/c")
+    assert PathMatcher(["x/a[!b]c"]).match("x/a-c")
+
+def test_paths_with_newlines_fall_back_to_single_matches():
+    matcher = PathMatcher(["*.tmp"])
+    assert matcher.match_batch(["a\nb.tmp", "c.tmp", "d"]) == [False, True, False]
+
+def test_no_patterns():
+    matcher = PathMatcher(["", "  "])
+    assert not matcher
+    assert not matcher.match("a")
+    assert matcher.match_batch(["a", "b"]) == [False, False]
@@ -0,0 +1,66 @@
+import random, math
+import pytest
+from conftest import _qt_stubbed
+from main import PerceptualHasher, BKTree, hamming_distance
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(2 ** 64 - 1, 0) == 64
+
+def test_bk_tree_search_equals_linear_search():
+    generator = random.Random(1)
+    hashes = [ generator.getrandbits(64) for _ in range(500) ]
+    # near duplicates of some of the hashes
+    hashes += [ hash ^ (1 << generator.randrange(64)) for hash in hashes[:50] ]
+    tree = BKTree()
+    for number, hash in enumerate(hashes):
+        tree.add(hash, number)
+    assert len(tree) == len(hashes)
+    for max_distance in [ 0, 1, 8, 24 ]:
+        for query in hashes[:20] + [ generator.getrandbits(64) ]:
+            expected = sorted( (hamming_distance(query, hash), number) for number, hash in enumerate(hashes) if hamming_distance(query, hash) <= max_distance )
+            found = tree.search(query, max_distance)
+            assert sorted(found) == expected
+            assert [ distance for distance, _ in found ] == sorted( distance for distance, _ in found )
+
+def test_empty_bk_tree():
+    assert BKTree().search(0, 64) == []
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        PerceptualHasher("md5")
+
+@pytest.mark.skipif(_qt_stubbed, reason="the images are decoded by Qt")
+@pytest.mark.parametrize("method", PerceptualHasher.METHODS)
+def test_similar_images_have_close_hashes(method, tmp_path):
+    from PyQt5.QtGui import QImage, QColor
+
+    def save_image(file_name, width, height, color_of):
+        image = QImage(width, height, QImage.Format_RGB32)
+        for x in range(width):
+            for y in range(height):
+                image.setPixelColor(x, y, QColor(*color_of(x / width, y / height)))
+        path = str(tmp_path / file_name)
+        assert image.save(path)
+        return path
+
+    def waves(x, y):
+        value = int(127 + 120 * math.sin(2 * math.pi * (1.3 * x + 0.4)) * math.cos(2 * math.pi * (0.9 * y + 0.1)))
+        return (value, value, 255 - value)
+
+    def brighter_waves(x, y):
+        return tuple( min(255, value + 20) for value in waves(x, y) )
+
+    def rotated_waves(x, y):
+        return waves(y, 1 - x)
+
+    hasher = PerceptualHasher(method)
+    original = hasher.hash_file(save_image("original.png", 160, 120, waves))
+    assert original is not None
+    assert hamming_distance(original, hasher.hash_file(save_image("original.jpg", 160, 120, waves))) <= 6
+    assert hamming_distance(original, hasher.hash_file(save_image("smaller.png", 80, 60, waves))) <= 6
+    assert hamming_distance(original, hasher.hash_file(save_image("brighter.png", 160, 120, brighter_waves))) <= 10
+    assert hamming_distance(original, hasher.hash_file(save_image("rotated.png", 160, 120, rotated_waves))) > 20
+    (tmp_path / "no_image.png").write_bytes(b"no image")
+    assert hasher.hash_file(str(tmp_path / "no_image.png")) is None
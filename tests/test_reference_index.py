@@ -0,0 +1,70 @@
+import os, hashlib
+from main import ReferenceIndex
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def md5(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+def test_find_duplicate(tmp_path):
+    reference_directory, base_directory = str(tmp_path / "reference"), str(tmp_path / "base")
+    write(os.path.join(reference_directory, "a", "x"), "same")
+    write(os.path.join(reference_directory, "y"), "diff")
+    write(os.path.join(base_directory, "z"), "same")
+    index = ReferenceIndex(str(tmp_path / "index.sqlite"))
+    try:
+        assert index.build(reference_directory) == 2
+        assert index.reference_directory() == reference_directory
+        z = os.path.join(base_directory, "z")
+        assert index.contains_size(4)
+        assert not index.contains_size(5)
+        assert index.find_duplicate(z, 4, md5(z), "md5", md5) == os.path.join(reference_directory, "a", "x")
+    finally:
+        index.close()
+
+def test_file_is_not_its_own_duplicate(tmp_path):
+    reference_directory = str(tmp_path / "reference")
+    f1 = os.path.join(reference_directory, "a", "f1")
+    write(f1, "x")
+    index = ReferenceIndex(str(tmp_path / "index.sqlite"))
+    try:
+        index.build(reference_directory)
+        assert index.find_duplicate(f1, 1, md5(f1), "md5", md5) is None
+        write(os.path.join(reference_directory, "f2"), "x")
+        index.build(reference_directory)
+        assert index.find_duplicate(f1, 1, md5(f1), "md5", md5) == os.path.join(reference_directory, "f2")
+    finally:
+        index.close()
+
+def test_rebuild_keeps_hashes_and_drops_vanished_files(tmp_path):
+    reference_directory = str(tmp_path / "reference")
+    x, y = os.path.join(reference_directory, "x"), os.path.join(reference_directory, "y")
+    write(x, "same")
+    write(y, "same")
+    hashed_paths = []
+    def counting_md5(path):
+        hashed_paths.append(path)
+        return md5(path)
+    query = str(tmp_path / "query")
+    write(query, "same")
+
+    index = ReferenceIndex(str(tmp_path / "index.sqlite"))
+    try:
+        index.build(reference_directory)
+        assert index.find_duplicate(query, 4, md5(query), "md5", counting_md5) is not None
+        num_hashed = len(hashed_paths)
+        index.build(reference_directory)
+        assert index.find_duplicate(query, 4, md5(query), "md5", counting_md5) is not None
+        assert len(hashed_paths) == num_hashed
+
+        os.remove(x)
+        os.remove(y)
+        assert index.build(reference_directory) == 0
+        assert not index.contains_size(4)
+        assert index.find_duplicate(query, 4, md5(query), "md5", counting_md5) is None
+    finally:
+        index.close()
@@ -0,0 +1,44 @@
+import csv, json
+import pytest
+import main
+from main import ReportWriter
+
+ROWS = [ ("/base/ä", 0, "dir", None, None, None), ("/base/ä/b,c.txt", 1, "file", 3, 1.5, "abc") ]
+
+def write_report(file_path, format_):
+    with ReportWriter(file_path, format_) as writer:
+        for row in ROWS:
+            writer.write(*row)
+    assert writer.num_rows() == len(ROWS)
+    assert writer.file_path() == file_path
+
+def test_csv(tmp_path):
+    file_path = str(tmp_path / "report.csv")
+    write_report(file_path, "CSV")
+    with open(file_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [ ReportWriter.COLUMNS, [ "/base/ä", "0", "dir", "", "", "" ], [ "/base/ä/b,c.txt", "1", "file", "3", "1.5", "abc" ] ]
+
+def test_jsonl(tmp_path):
+    file_path = str(tmp_path / "report.jsonl")
+    write_report(file_path, "JSONL")
+    with open(file_path, encoding="utf-8") as f:
+        rows = [ json.loads(line) for line in f ]
+    assert rows == [ dict(zip(ReportWriter.COLUMNS, row)) for row in ROWS ]
+
+def test_parquet(tmp_path, monkeypatch):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    monkeypatch.setattr(ReportWriter, "PARQUET_ROW_GROUP_SIZE", 1)
+    file_path = str(tmp_path / "report.parquet")
+    write_report(file_path, "Parquet")
+    table = pyarrow.parquet.read_table(file_path)
+    assert table.column_names == ReportWriter.COLUMNS
+    assert [ tuple(row.values()) for row in table.to_pylist() ] == ROWS
+
+def test_unknown_or_unavailable_format(tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        ReportWriter(str(tmp_path / "report.xml"), "XML")
+    monkeypatch.setattr(main, "pyarrow", None)
+    with pytest.raises(ValueError):
+        ReportWriter(str(tmp_path / "report.parquet"), "Parquet")
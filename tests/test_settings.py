@@ -0,0 +1,55 @@
+import main
+from conftest import _MemorySettings
+from main import FesSettings
+
+def test_convert():
+    assert FesSettings._convert("true", bool, False) is True
+    assert FesSettings._convert("0", bool, True) is False
+    assert FesSettings._convert(1, bool, False) is True
+    assert FesSettings._convert("12", int, 0) == 12
+    assert FesSettings._convert("12.0", int, 0) == 12
+    assert FesSettings._convert("x", int, 7) == 7
+    assert FesSettings._convert("1.5", float, 0.0) == 1.5
+    assert FesSettings._convert(None, float, 2.5) == 2.5
+    assert FesSettings._convert("a", list, []) == ["a"]
+    assert FesSettings._convert("", list, ["x"]) == []
+    assert FesSettings._convert(None, tuple, ()) == ()
+    assert FesSettings._convert(["1", "2", "3", "4"], tuple, ()) == ("1", "2", "3", "4")
+    assert FesSettings._convert(3, str, "") == "3"
+
+def test_values_are_read_typed_and_cached():
+    storage = _MemorySettings()
+    storage.setValue("flag", "false")
+    storage.setValue("number", "3")
+    storage.setValue("list", "only")
+    settings = FesSettings(storage)
+    assert settings.contains("flag")
+    assert settings.value("flag", True) is False
+    assert settings.value("number", 0) == 3
+    assert settings.value("number", type_=float) == 3.0
+    assert settings.value("list", [], list) == ["only"]
+    assert settings.value("missing", "default") == "default"
+    # returned lists are copies
+    settings.value("list", [], list).append("other")
+    assert settings.value("list", [], list) == ["only"]
+
+def test_write_behind(monkeypatch):
+    storage = _MemorySettings()
+    settings = FesSettings(storage)
+    monkeypatch.setattr(settings, "_schedule_flush", lambda: None)
+    settings.setValue("a", 1)
+    settings.setValue("a", 2)
+    assert settings.value("a") == 2
+    assert storage.value("a") is None
+    settings.flush()
+    assert storage.value("a") == 2
+
+def test_write_through_without_application(monkeypatch):
+    monkeypatch.setattr(main, "QCoreApplication", type("QCoreApplication", (), { "instance": staticmethod(lambda: None) }))
+    storage = _MemorySettings()
+    settings = FesSettings(storage)
+    settings.setValue("a", [1, 2])
+    assert storage.value("a") == [1, 2]
+    settings.clear()
+    assert not settings.contains("a")
+    assert storage.allKeys() == []
@@ -0,0 +1,52 @@
+import os
+from main import FileInfo
+
+def file_info(rel_path, size, mtime, uid=1000, is_dir=False):
+    return FileInfo("/base/" + rel_path, rel_path, 0, is_dir, size, mtime, mtime, uid)
+
+def create_filter(main, **values):
+    main.fes_settings.clear()
+    for name, value in values.items():
+        main.fes_settings.setValue("StatFilter." + name, value)
+    return main.StatFilter()
+
+MB = 1024 * 1024
+
+def test_no_limits(gui_main):
+    stat_filter = create_filter(gui_main)
+    assert not stat_filter.requires_stats()
+    assert stat_filter.use_files([ file_info("a", None, None) ]) == [True]
+
+def test_size_range(gui_main):
+    file_infos = [ file_info("a", MB - 1, 0.0), file_info("b", MB, 0.0), file_info("c", 2 * MB, 0.0), file_info("d", 3 * MB, 0.0) ]
+    stat_filter = create_filter(gui_main, min_size_mb=1.0, max_size_mb=2.0)
+    assert stat_filter.requires_stats()
+    assert stat_filter.use_files(file_infos) == [False, True, True, False]
+
+def test_modification_time_range(gui_main):
+    file_infos = [ file_info("a", 1, 599.0), file_info("b", 1, 600.0), file_info("c", 1, 1199.5), file_info("d", 1, 1200.0) ]
+    stat_filter = create_filter(gui_main, modified_after_enabled=True, modified_after=600, modified_before_enabled=True, modified_before=1200)
+    assert stat_filter.use_files(file_infos) == [False, True, True, False]
+
+def test_owner(gui_main):
+    file_infos = [ file_info("a", 1, 0.0, uid=1000), file_info("b", 1, 0.0, uid=0) ]
+    if gui_main.pwd is None:
+        assert create_filter(gui_main, owner="0").use_files(file_infos) == [True, True]
+    else:
+        assert create_filter(gui_main, owner="0").use_files(file_infos) == [False, True]
+        assert create_filter(gui_main, owner="no such user ~").use_files(file_infos) == [False, False]
+
+def test_folders_pass_and_missing_stats_fail(gui_main):
+    stat_filter = create_filter(gui_main, min_size_mb=1.0)
+    assert stat_filter.use_files([ file_info("a", None, None, is_dir=True), file_info("b", None, None) ]) == [True, False]
+
+def test_use_file(gui_main, tmp_path):
+    small, large = str(tmp_path / "small"), str(tmp_path / "large")
+    with open(small, "wb") as f:
+        f.write(b"1")
+    with open(large, "wb") as f:
+        f.write(b"1" * MB)
+    stat_filter = create_filter(gui_main, min_size_mb=1.0)
+    assert not stat_filter.use_file(small, "small", 0)
+    assert stat_filter.use_file(large, "large", 0)
+    assert not stat_filter.use_file(str(tmp_path / "missing"), "missing", 0)
@@ -0,0 +1,66 @@
+import os
+import pytest
+import main
+from main import walk_directories_listings, normalize_base_directories
+
+def create_tree(root, num_directories):
+    for number in range(num_directories):
+        directory = os.path.join(root, f'd{number}', "sub")
+        os.makedirs(directory)
+        with open(os.path.join(directory, "f"), "wb") as f:
+            f.write(b"1" * number)
+
+def os_walk_listings(base_directories):
+    listings = set()
+    for base_directory in base_directories:
+        for root, dirnames, filenames in os.walk(base_directory):
+            level = os.path.relpath(root, base_directory).count(os.sep) + 1 if root != base_directory else 0
+            listings.add( (root, level, tuple(sorted(dirnames)), tuple(sorted(filenames))) )
+    return listings
+
+def walk_listings(base_directories, with_stats=False):
+    listings = set()
+    for listing in walk_directories_listings(base_directories, with_stats=with_stats):
+        if listing is not None:
+            root, level, dirnames, filenames, stats = listing
+            assert (stats is not None) == with_stats
+            listings.add( (root, level, tuple(sorted(dirnames)), tuple(sorted(filenames))) )
+    return listings
+
+def test_listings_equal_os_walk(tmp_path):
+    base_directories = [ str(tmp_path / "a"), str(tmp_path / "b"), str(tmp_path / "c") ]
+    for number, base_directory in enumerate(base_directories):
+        create_tree(base_directory, number + 1)
+    assert walk_listings(base_directories) == os_walk_listings(base_directories)
+
+def test_stats(tmp_path):
+    create_tree(str(tmp_path), 3)
+    assert walk_listings([ str(tmp_path) ], with_stats=True) == os_walk_listings([ str(tmp_path) ])
+    for listing in walk_directories_listings([ str(tmp_path) ], with_stats=True):
+        if listing is None:
+            continue
+        root, level, dirnames, filenames, stats = listing
+        for name, entry_stat in zip(dirnames + filenames, stats):
+            assert entry_stat.st_size == os.stat(os.path.join(root, name)).st_size
+
+def test_base_directories_on_different_devices(tmp_path, monkeypatch):
+    # every base directory pretends to be on its own device and gets its own worker thread
+    base_directories = [ str(tmp_path / str(number)) for number in range(4) ]
+    for number, base_directory in enumerate(base_directories):
+        create_tree(base_directory, number + 1)
+    real_stat = os.stat
+    def stat(path, *args, **kwargs):
+        if path in base_directories:
+            return os.stat_result( real_stat(path)[:2] + (base_directories.index(path),) + real_stat(path)[3:] )
+        return real_stat(path, *args, **kwargs)
+    monkeypatch.setattr(main.os, "stat", stat)
+    assert walk_listings(base_directories) == os_walk_listings(base_directories)
+
+def test_missing_base_directory(tmp_path):
+    create_tree(str(tmp_path / "a"), 1)
+    with pytest.raises(OSError):
+        walk_listings([ str(tmp_path / "a"), str(tmp_path / "missing") ])
+
+def test_normalize_base_directories(tmp_path):
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+    assert normalize_base_directories([ a, os.path.join(a, "x"), b, a + os.sep, "" ]) == [ a, b ]